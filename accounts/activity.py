@@ -0,0 +1,130 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from core.cache import ephemeral_cache as cache, ephemeral_cache_is_local
+from django.db.models import Case, DateTimeField, Value, When
+from django.db.models.functions import Greatest
+
+BUCKET_TTL = 24 * 60 * 60  # seconds a pending bucket waits for the flusher
+FLUSHER_TTL = 120  # seconds a flusher counts as running after its last flush
+FLUSH_CHUNK = 500
+
+
+def _granularity():
+    return getattr(settings, 'LAST_SEEN_GRANULARITY', 60)
+
+
+def _gate_key(profile_id):
+    return f"last_seen:gate:{profile_id}"
+
+
+def _bucket_count_key(bucket):
+    return f"last_seen:bucket:{bucket}:n"
+
+
+def _bucket_slot_key(bucket, slot):
+    return f"last_seen:bucket:{bucket}:{slot}"
+
+
+_FLUSHED_THROUGH_KEY = "last_seen:flushed_through"
+_FLUSHER_KEY = "last_seen:flusher"
+
+
+def can_write_behind():
+    """
+    Whether a flusher could read coalesced timestamps at all. A per-process
+    locmem ephemeral cache is invisible to it.
+    """
+    return not ephemeral_cache_is_local()
+
+
+def mark_flusher_running(interval=0):
+    """Note that flush_last_seen will run again within interval seconds"""
+    cache.set(_FLUSHER_KEY, True, timeout=max(FLUSHER_TTL, interval * 3))
+
+
+def is_write_behind():
+    """
+    Whether last_seen is coalesced in the cache for flush_last_seen. Only
+    while a flusher is running; otherwise, as under a bare runserver or
+    daphne, record_activity writes through so last_seen still advances.
+    """
+    return can_write_behind() and cache.has_key(_FLUSHER_KEY)
+
+
+def record_activity(profile_id, now=None):
+    """
+    Note that a profile was active. At most once per LAST_SEEN_GRANULARITY
+    seconds per profile, the timestamp is appended to the current time
+    bucket for flush_last_seen to write in bulk; other calls are a single
+    cache add and never touch the database.
+    """
+    granularity = _granularity()
+    now = time.time() if now is None else now
+
+    if not cache.add(_gate_key(profile_id), 1, timeout=granularity):
+        return
+
+    if not is_write_behind():
+        from .models import Profile
+        Profile.objects.filter(id=profile_id).update(last_seen=_as_datetime(now))
+        return
+
+    bucket = int(now // granularity)
+    count_key = _bucket_count_key(bucket)
+    cache.add(count_key, 0, timeout=BUCKET_TTL)
+    # incr is atomic, so concurrent requests never claim the same slot
+    slot = cache.incr(count_key)
+    cache.set(_bucket_slot_key(bucket, slot), (profile_id, now), timeout=BUCKET_TTL)
+
+
+def flush_last_seen(now=None):
+    """
+    Write every settled bucket's timestamps to Profile.last_seen, newest per
+    profile, with one CASE UPDATE per FLUSH_CHUNK profiles. last_seen only
+    ever moves forward. Returns the number of profiles updated.
+    """
+    granularity = _granularity()
+    now = time.time() if now is None else now
+
+    # The previous bucket may still be taking a straggling request or two
+    through = int(now // granularity) - 2
+    oldest = through - BUCKET_TTL // granularity
+    start = max(cache.get(_FLUSHED_THROUGH_KEY, oldest) + 1, oldest)
+
+    latest = {}
+    for bucket in range(start, through + 1):
+        count = cache.get(_bucket_count_key(bucket))
+        if not count:
+            continue
+        slots = [_bucket_slot_key(bucket, slot) for slot in range(1, count + 1)]
+        for profile_id, seen in cache.get_many(slots).values():
+            latest[profile_id] = max(seen, latest.get(profile_id, seen))
+        cache.delete_many(slots + [_bucket_count_key(bucket)])
+
+    updated = _write_last_seen(latest)
+    cache.set(_FLUSHED_THROUGH_KEY, through, timeout=None)
+    return updated
+
+
+def _write_last_seen(latest):
+    from .models import Profile
+
+    updated = 0
+    items = list(latest.items())
+    for i in range(0, len(items), FLUSH_CHUNK):
+        chunk = items[i:i + FLUSH_CHUNK]
+        updated += Profile.objects.filter(id__in=[profile_id for profile_id, _ in chunk]).update(
+            last_seen=Greatest(
+                'last_seen',
+                Case(
+                    *[When(id=profile_id, then=Value(_as_datetime(seen))) for profile_id, seen in chunk],
+                    output_field=DateTimeField()
+                )
+            )
+        )
+    return updated
+
+
+def _as_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
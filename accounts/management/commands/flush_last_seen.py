@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.activity import can_write_behind, flush_last_seen, mark_flusher_running
+
+
+class Command(BaseCommand):
+    help = (
+        "Write last_seen timestamps coalesced in the ephemeral cache to profiles in bulk. "
+        "Run once, or keep running with --interval."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0, help="Seconds between flushes; 0 flushes once")
+
+    def handle(self, *args, **options):
+        if not can_write_behind():
+            self.stdout.write("The ephemeral cache is per-process; last_seen is written through, nothing to flush")
+            return
+
+        while True:
+            # Workers write through unless a flusher keeps running
+            if options['interval']:
+                mark_flusher_running(options['interval'])
+            updated = flush_last_seen()
+            self.stdout.write(self.style.SUCCESS(f"Flushed last_seen for {updated} profiles"))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
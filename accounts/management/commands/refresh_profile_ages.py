@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Recompute Profile.age from birth_date. Run nightly, shortly after midnight UTC."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        batch_size = options['batch_size']
+        pending, updated = [], 0
+
+        profiles = (
+            Profile.objects
+            .filter(birth_date__isnull=False)
+            .only('id', 'birth_date', 'age')
+            .iterator(chunk_size=batch_size)
+        )
+        for profile in profiles:
+            age = profile.calculate_age(today)
+            if profile.age != age:
+                profile.age = age
+                pending.append(profile)
+            if len(pending) >= batch_size:
+                updated += Profile.objects.bulk_update(pending, ['age'])
+                pending = []
+
+        if pending:
+            updated += Profile.objects.bulk_update(pending, ['age'])
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {updated} profile ages"))
@@ -1,25 +1,46 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.shortcuts import redirect
 from django.urls import reverse
+from .activity import record_activity
+from .selectors import get_request_profile
 
-class LastSeenMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
 
-    def __call__(self, request):
-        if request.user.is_authenticated:
-            profile = getattr(request.user, "profile", None)
-            if profile:
-                from django.utils import timezone
-                from .services import update_last_seen
-                update_last_seen(profile)
-        
-        return self.get_response(request)
-
-class ProfileCompletionMiddleware:
+class SyncAndAsyncMiddleware:
+    """
+    Runs process(request) before the view, returning its response if it
+    gives one. Under ASGI, process runs in a single thread hop and the rest
+    of the chain stays async, so async views such as long-polls never pin
+    a worker thread while they wait.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return await sync_to_async(self.process)(request) or await self.get_response(request)
+
+    def process(self, request):
+        raise NotImplementedError
+
+
+class LastSeenMiddleware(SyncAndAsyncMiddleware):
+    def process(self, request):
+        profile = get_request_profile(request)
+        if profile:
+            record_activity(profile.id)
+
+
+class ProfileCompletionMiddleware(SyncAndAsyncMiddleware):
+    def process(self, request):
         if request.user.is_authenticated:
             # Avoid redirect loop for onboarding, welcome, logout, and admin
             logout_url = reverse("logout")
@@ -32,12 +53,11 @@ class ProfileCompletionMiddleware:
             if request.path not in [logout_url, welcome_url] and not is_onboarding_path and not is_admin_path:
                 # Admins and staff don't need to complete profiles to access tools
                 if request.user.is_staff or request.user.is_superuser:
-                    return self.get_response(request)
+                    return None
 
-                profile = getattr(request.user, "profile", None)
+                profile = get_request_profile(request)
                 if profile:
                     if not profile.is_complete:
                         step = max(1, profile.onboarding_step)
                         return redirect("onboarding_step", step=step)
-
-        return self.get_response(request)
+        return None
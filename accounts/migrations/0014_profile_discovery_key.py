@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 02:07
+
+import random
+
+import accounts.models
+from django.db import migrations, models
+
+
+def assign_discovery_keys(apps, schema_editor):
+    # AddField evaluates the callable default once, so spread existing rows out
+    Profile = apps.get_model('accounts', 'Profile')
+    profiles = list(Profile.objects.only('id'))
+    for profile in profiles:
+        profile.discovery_key = random.randrange(accounts.models.DISCOVERY_KEY_SPACE)
+    Profile.objects.bulk_update(profiles, ['discovery_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_alter_profile_hobbies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='discovery_key',
+            field=models.PositiveIntegerField(db_index=True, default=accounts.models.generate_discovery_key, editable=False),
+        ),
+        migrations.RunPython(assign_discovery_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-18 02:40
+
+import accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_profile_discovery_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='discovery_key',
+            field=models.PositiveIntegerField(default=accounts.models.generate_discovery_key, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['is_visible', 'is_complete', 'discovery_key'], name='profile_disc_walk_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['is_visible', 'is_complete', 'gender', 'discovery_key'], name='profile_disc_gender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['is_visible', 'last_seen', 'id'], name='profile_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('is_complete', True), ('is_visible', True)), fields=['discovery_key', 'id'], name='profile_walk_partial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('is_complete', True), ('is_visible', True)), fields=['gender', 'discovery_key', 'id'], name='profile_gender_partial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['last_seen', 'id'], name='profile_activity_partial_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 6.0 on 2026-10-18 03:05
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_ages(apps, schema_editor):
+    Profile = apps.get_model('accounts', 'Profile')
+    today = timezone.now().date()
+    profiles = list(Profile.objects.filter(birth_date__isnull=False).only('id', 'birth_date'))
+    for profile in profiles:
+        born = profile.birth_date
+        profile.age = today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+    Profile.objects.bulk_update(profiles, ['age'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_profile_discovery_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='profile',
+            name='profile_disc_walk_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='profile',
+            name='profile_disc_gender_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='profile',
+            name='profile_walk_partial_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='profile',
+            name='profile_gender_partial_idx',
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='age',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_ages, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['is_visible', 'is_complete', 'discovery_key', 'age'], name='profile_disc_walk_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['is_visible', 'is_complete', 'gender', 'discovery_key', 'age'], name='profile_disc_gender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('is_complete', True), ('is_visible', True)), fields=['discovery_key', 'id', 'age'], name='profile_walk_partial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('is_complete', True), ('is_visible', True)), fields=['gender', 'discovery_key', 'id', 'age'], name='profile_gender_partial_idx'),
+        ),
+    ]
@@ -3,8 +3,16 @@ from django.db import models
 from django.utils import timezone
 from .managers import UserManager
 from .constants import COUNTRY_CHOICES, CITY_CHOICES, ETHNICITY_CHOICES
+import random
 import uuid
 
+# Upper bound of Profile.discovery_key, the per-profile random sort key
+DISCOVERY_KEY_SPACE = 2 ** 31
+
+
+def generate_discovery_key():
+    return random.randrange(DISCOVERY_KEY_SPACE)
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -29,6 +37,8 @@ class Profile(models.Model):
     display_name = models.CharField(max_length=100, blank=True)
     bio = models.TextField(blank=True)
     birth_date = models.DateField(null=True, blank=True)
+    # Derived from birth_date on save and refreshed nightly (refresh_profile_ages)
+    age = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
     
     # Gender & Basic Info
@@ -143,10 +153,40 @@ class Profile(models.Model):
     onboarding_step = models.IntegerField(default=0)
     profile_completeness = models.IntegerField(default=0, help_text="Percentage 0-100")
 
+    # Random key used to walk discovery candidates in a seeded, indexed order
+    discovery_key = models.PositiveIntegerField(default=generate_discovery_key, editable=False)
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     last_seen = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        # Discovery filters on booleans and walks discovery_key (web) or
+        # (last_seen, id) (API). MySQL compares booleans with `= 1` and can
+        # seek the composite indexes, but ignores conditional ones; SQLite
+        # renders a bare `WHERE is_visible` that only partial indexes match.
+        indexes = [
+            # Trailing age lets the walk apply age preferences from the index
+            models.Index(fields=['is_visible', 'is_complete', 'discovery_key', 'age'], name='profile_disc_walk_idx'),
+            models.Index(fields=['is_visible', 'is_complete', 'gender', 'discovery_key', 'age'], name='profile_disc_gender_idx'),
+            models.Index(fields=['is_visible', 'last_seen', 'id'], name='profile_activity_idx'),
+            models.Index(
+                fields=['discovery_key', 'id', 'age'],
+                condition=models.Q(is_visible=True, is_complete=True),
+                name='profile_walk_partial_idx',
+            ),
+            models.Index(
+                fields=['gender', 'discovery_key', 'id', 'age'],
+                condition=models.Q(is_visible=True, is_complete=True),
+                name='profile_gender_partial_idx',
+            ),
+            models.Index(
+                fields=['last_seen', 'id'],
+                condition=models.Q(is_visible=True),
+                name='profile_activity_partial_idx',
+            ),
+        ]
+
     @property
     def is_online(self):
         from .presence import is_online
@@ -158,8 +198,18 @@ class Profile(models.Model):
     def save(self, *args, **kwargs):
         # Update completeness percentage before saving
         self.profile_completeness = self.calculate_completeness()
+        self.age = self.calculate_age()
         super().save(*args, **kwargs)
 
+    def calculate_age(self, today=None):
+        """Age in whole years on the given day (defaults to today)"""
+        if not self.birth_date:
+            return None
+        today = today or timezone.now().date()
+        return today.year - self.birth_date.year - (
+            (today.month, today.day) < (self.birth_date.month, self.birth_date.day)
+        )
+
     def calculate_completeness(self):
         """Calculate profile completion percentage"""
         core_fields = [
@@ -1,6 +1,7 @@
-from django.core.cache import cache
+from core.cache import ephemeral_cache as cache
 
 ONLINE_TTL = 15  # seconds
+HEARTBEAT_INTERVAL = 10  # seconds; chat sockets refresh presence this often
 
 
 def _presence_key(profile_id):
@@ -15,8 +16,29 @@ def mark_online(profile_id):
     )
 
 
+async def amark_online(profile_id):
+    await cache.aset(
+        _presence_key(profile_id),
+        True,
+        timeout=ONLINE_TTL
+    )
+
+
 def is_online(profile_id):
     return cache.get(
         _presence_key(profile_id),
         False
     )
+
+
+def online_among(profile_ids):
+    """
+    The subset of profile_ids currently online, in one cache round-trip.
+
+    Each online profile is its own expiring key, so the online set needs
+    no sweeping and spreads across Redis cluster slots on its own.
+    """
+    keys = {_presence_key(profile_id): profile_id for profile_id in profile_ids}
+    if not keys:
+        return set()
+    return {keys[key] for key in cache.get_many(list(keys))}
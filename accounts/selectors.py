@@ -1,5 +1,5 @@
 from .models import Profile
-from .presence import is_online
+from .presence import online_among
 
 
 def get_visible_profiles():
@@ -9,12 +9,41 @@ def get_visible_profiles():
     )
 
 
+def get_request_profile(request):
+    """
+    The signed-in user's profile, loaded once per request and cached on
+    request.user (so request.user.profile is free afterwards) and on
+    request.profile. None for anonymous users and users without one.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    if not _profile_rel.is_cached(user):
+        profile = Profile.objects.filter(user_id=user.pk).first()
+        if profile is not None:
+            Profile.user.field.set_cached_value(profile, user)
+        _profile_rel.set_cached_value(user, profile)
+    request.profile = _profile_rel.get_cached_value(user)
+    return request.profile
+
+
 def get_profile_for_user(user):
+    if _profile_rel.is_cached(user):
+        profile = _profile_rel.get_cached_value(user)
+        if profile is None:
+            raise Profile.DoesNotExist
+        return profile
     return Profile.objects.select_related('user').get(user=user)
 
 
+# user.profile, as cached by the reverse one-to-one accessor
+_profile_rel = Profile.user.field.remote_field
+
+
 def get_presence_map(profiles):
+    profile_ids = [profile.id for profile in profiles]
+    online = online_among(profile_ids)
     return {
-        profile.id: is_online(profile.id)
-        for profile in profiles
+        profile_id: profile_id in online
+        for profile_id in profile_ids
     }
@@ -1,7 +1,11 @@
-from django.test import TestCase, Client
+import tempfile
+import time
+from django.test import TestCase, Client, override_settings
+from django.core.cache import caches
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from .models import User, Profile, ProfilePhoto
+from .activity import flush_last_seen, mark_flusher_running, record_activity
 import io
 from PIL import Image
 
@@ -103,3 +107,102 @@ class ProfilePhotoUploadTest(TestCase):
         # Verify photo count (2 from previous test if ran sequentially? No, TestCase cleans up DB)
         # But this is a separate test method.
         self.assertEqual(ProfilePhoto.objects.filter(profile=self.profile).count(), 1)
+
+
+
+class LastSeenTests(TestCase):
+    def setUp(self):
+        caches['ephemeral'].clear()
+        self.profile = User.objects.create_user(email='active@example.com', password='password123').profile
+        self.start = time.time()
+
+    def test_locmem_writes_through_once_per_window(self):
+        local = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'ephemeral': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }
+        with override_settings(CACHES=local):
+            with self.assertNumQueries(1):
+                record_activity(self.profile.id, self.start)
+                record_activity(self.profile.id, self.start + 1)
+        self.profile.refresh_from_db()
+        self.assertAlmostEqual(self.profile.last_seen.timestamp(), self.start, places=3)
+
+    def test_shared_cache_writes_through_without_a_flusher(self):
+        with self.assertNumQueries(1):
+            record_activity(self.profile.id, self.start)
+            record_activity(self.profile.id, self.start + 1)
+        self.profile.refresh_from_db()
+        self.assertAlmostEqual(self.profile.last_seen.timestamp(), self.start, places=3)
+
+    def test_shared_cache_defers_writes_to_the_flush(self):
+        mark_flusher_running()
+        with override_settings(LAST_SEEN_GRANULARITY=60):
+            later = self.start + 3600
+            with self.assertNumQueries(0):
+                record_activity(self.profile.id, later)
+                record_activity(self.profile.id, later + 1)
+
+            # Not flushed while its bucket may still be filling
+            self.assertEqual(flush_last_seen(later + 60), 0)
+            self.assertEqual(flush_last_seen(later + 180), 1)
+            self.profile.refresh_from_db()
+            self.assertAlmostEqual(self.profile.last_seen.timestamp(), later, places=3)
+
+            # last_seen never moves backwards
+            caches['ephemeral'].delete(f"last_seen:gate:{self.profile.id}")
+            record_activity(self.profile.id, later - 1800)
+            flush_last_seen(later + 240)
+            self.profile.refresh_from_db()
+            self.assertAlmostEqual(self.profile.last_seen.timestamp(), later, places=3)
+
+
+class SQLiteCacheTests(TestCase):
+    """The ephemeral fallback backend, as two processes would share it"""
+
+    def setUp(self):
+        from core.cache import SQLiteCache
+        self.path = tempfile.mkdtemp() + '/ephemeral.sqlite3'
+        self.one = SQLiteCache(self.path, {})
+        self.other = SQLiteCache(self.path, {})
+
+    def test_file_is_private_to_its_owner(self):
+        import os
+        import stat
+        from django.core.exceptions import ImproperlyConfigured
+        from core.cache import SQLiteCache
+
+        self.one.set('a', 1)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+        planted = tempfile.mkdtemp() + '/planted.sqlite3'
+        open(planted, 'w').close()
+        try:
+            os.chown(planted, os.getuid() + 1, -1)
+        except PermissionError:
+            self.skipTest("needs to run as root to plant a file owned by someone else")
+        with self.assertRaises(ImproperlyConfigured):
+            SQLiteCache(planted, {}).get('a')
+
+    def test_values_are_shared(self):
+        self.one.set_many({'a': {'x': 1}, 'b': True, 'c': 3}, timeout=60)
+        self.assertEqual(self.other.get_many(['a', 'b', 'c', 'missing']), {'a': {'x': 1}, 'b': True, 'c': 3})
+        self.other.delete_many(['a', 'b'])
+        self.assertIsNone(self.one.get('a'))
+        self.assertTrue(self.one.has_key('c'))
+
+    def test_add_and_incr_are_atomic(self):
+        self.assertTrue(self.one.add('gate', 1, timeout=60))
+        self.assertFalse(self.other.add('gate', 1, timeout=60))
+        self.assertEqual(self.other.incr('gate'), 2)
+        self.assertEqual(self.one.incr('gate', 3), 5)
+        with self.assertRaises(ValueError):
+            self.one.incr('missing')
+
+    def test_entries_expire(self):
+        self.one.set('soon', 'gone', timeout=0.05)
+        self.one.set('forever', 'here', timeout=None)
+        time.sleep(0.1)
+        self.assertIsNone(self.other.get('soon'))
+        self.assertTrue(self.other.add('soon', 'again', timeout=60))
+        self.assertEqual(self.other.get('forever'), 'here')
@@ -87,3 +87,14 @@ class ProfileCompletionMiddlewareTest(TestCase):
         response = middleware(request)
         
         self.assertEqual(response, 'success')
+
+
+class AsyncMiddlewareChainTest(TestCase):
+    def test_asgi_chain_needs_no_sync_adapters(self):
+        """Every middleware runs async under ASGI, so long-poll views never hold a thread."""
+        from django.core.handlers.asgi import ASGIHandler
+        from django.test import override_settings
+
+        # Django only logs each adaptation it makes when DEBUG is on
+        with override_settings(DEBUG=True), self.assertNoLogs('django.request', level='DEBUG'):
+            ASGIHandler()
@@ -0,0 +1,126 @@
+import base64
+import binascii
+import uuid
+from django.db.models import Q
+from messaging.selectors import get_message_page
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+def encode_position(moment, pk):
+    """Opaque cursor for a (timestamp, id) keyset position"""
+    raw = f"{moment.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_position(token, message='Invalid cursor'):
+    """Inverse of encode_position; raises NotFound for malformed tokens"""
+    try:
+        raw = base64.urlsafe_b64decode(token.encode()).decode()
+        moment, pk = raw.split('|')
+        position = (parse_datetime(moment), uuid.UUID(pk))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise NotFound(message)
+    if position[0] is None:
+        raise NotFound(message)
+    return position
+
+
+class DiscoveryCursorPagination(BasePagination):
+    """
+    Keyset pagination over (last_seen, id), newest first.
+
+    The cursor is an opaque token encoding the position of the last row
+    served, so every page is a single indexed range scan no matter how
+    deep the client has scrolled.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 50
+    ordering = ('-last_seen', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    @staticmethod
+    def encode_cursor(profile):
+        return encode_position(profile.last_seen, profile.id)
+
+    def decode_cursor(self, request):
+        """Return (last_seen, id) for the cursor in the request, or None"""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        return self.decode_cursor_token(token)
+
+    def decode_cursor_token(self, token):
+        return decode_position(token, self.invalid_cursor_message)
+
+    def after(self, queryset, position):
+        """Rows strictly after position in (-last_seen, -id) order"""
+        queryset = queryset.order_by(*self.ordering)
+        if position is None:
+            return queryset
+        last_seen, profile_id = position
+        return queryset.filter(
+            Q(last_seen__lt=last_seen) |
+            Q(last_seen=last_seen, id__lt=profile_id)
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        rows = list(self.after(queryset, self.decode_cursor(request))[:size + 1])
+        page = rows[:size]
+        self.next_cursor = self.encode_cursor(page[-1]) if len(rows) > size else None
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next_cursor': self.next_cursor,
+            'results': data,
+        })
+
+
+class MessageHistoryPagination(BasePagination):
+    """
+    Keyset pagination over message history on (created_at, id).
+
+    The first page is the latest page_size messages; older_cursor then
+    loads the page before it. Each page comes back oldest first, ready
+    to prepend, and costs one range scan on the history index.
+    """
+    cursor_query_param = 'before'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        token = request.query_params.get(self.cursor_query_param)
+        before = decode_position(token, self.invalid_cursor_message) if token else None
+        page, has_older = get_message_page(queryset, before=before, limit=self.get_page_size(request))
+        self.older_cursor = encode_position(page[0].created_at, page[0].id) if has_older else None
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'older_cursor': self.older_cursor,
+            'results': data,
+        })
@@ -1,8 +1,11 @@
 from rest_framework import serializers
 from accounts.models import User, Profile, ProfilePhoto
+from accounts.presence import online_among
 from discovery.models import Preference
 from interactions.models import Like, Match, Block, Report, Skip, ProfileView
-from messaging.models import Conversation, Message, MessageRead
+from messaging.models import Conversation, Message, ReadState, make_pair_key
+from messaging.selectors import get_message_page
+from .pagination import encode_position
 from django.contrib.auth.password_validation import validate_password
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
@@ -119,10 +122,31 @@ class ProfilePhotoSerializer(serializers.ModelSerializer):
         return None
 
 
+def _presence(context, profiles):
+    """
+    The response-wide presence map in context['presence'], filled in for
+    any of profiles not looked up yet with a single get_many.
+    """
+    presence = context.setdefault('presence', {})
+    pending = {profile.id for profile in profiles} - set(presence)
+    if pending:
+        online = online_among(pending)
+        presence.update((profile_id, profile_id in online) for profile_id in pending)
+    return presence
+
+
+class ProfileCardListSerializer(serializers.ListSerializer):
+    """Looks up presence for a whole list of profile cards at once"""
+    def to_representation(self, data):
+        profiles = list(data.all() if hasattr(data, 'all') else data)
+        _presence(self.context, profiles)
+        return [self.child.to_representation(profile) for profile in profiles]
+
+
 class ProfileListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for profile lists/discovery"""
     profile_picture_url = serializers.SerializerMethodField()
-    age = serializers.SerializerMethodField()
+    is_online = serializers.SerializerMethodField()
     
     class Meta:
         model = Profile
@@ -132,6 +156,10 @@ class ProfileListSerializer(serializers.ModelSerializer):
             'height', 'ethnicity', 'is_verified', 'last_seen', 'is_online',
             'smoking', 'drinking'
         ]
+        list_serializer_class = ProfileCardListSerializer
+
+    def get_is_online(self, obj):
+        return _presence(self.context, [obj])[obj.id]
         
     def get_profile_picture_url(self, obj):
         if obj.profile_picture:
@@ -140,22 +168,12 @@ class ProfileListSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.profile_picture.url)
             return obj.profile_picture.url
         return None
-        
-    def get_age(self, obj):
-        if obj.birth_date:
-            from datetime import date
-            today = date.today()
-            return today.year - obj.birth_date.year - (
-                (today.month, today.day) < (obj.birth_date.month, obj.birth_date.day)
-            )
-        return None
 
 
 class ProfileDetailSerializer(serializers.ModelSerializer):
     """Complete profile serializer with all details"""
     user = UserSerializer(read_only=True)
     profile_picture_url = serializers.SerializerMethodField()
-    age = serializers.SerializerMethodField()
     photos = ProfilePhotoSerializer(many=True, read_only=True)
     all_photo_urls = serializers.SerializerMethodField()
     matches_count = serializers.SerializerMethodField()
@@ -192,15 +210,6 @@ class ProfileDetailSerializer(serializers.ModelSerializer):
             return obj.profile_picture.url
         return None
         
-    def get_age(self, obj):
-        if obj.birth_date:
-            from datetime import date
-            today = date.today()
-            return today.year - obj.birth_date.year - (
-                (today.month, today.day) < (obj.birth_date.month, obj.birth_date.day)
-            )
-        return None
-        
     def get_all_photo_urls(self, obj):
         request = self.context.get('request')
         urls = []
@@ -280,13 +289,13 @@ class MatchSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'profile1', 'profile2', 'created_at']
         
     def get_conversation_id(self, obj):
-        from messaging.models import Conversation
-        conversation = Conversation.objects.filter(
-            participants=obj.profile1
-        ).filter(
-            participants=obj.profile2
-        ).first()
-        return str(conversation.id) if conversation else None
+        conversation_id = (
+            Conversation.objects
+            .filter(pair_key=make_pair_key(obj.profile1_id, obj.profile2_id))
+            .values_list('id', flat=True)
+            .first()
+        )
+        return str(conversation_id) if conversation_id else None
         
     def get_other_profile(self, obj):
         request = self.context.get('request')
@@ -346,32 +355,83 @@ class ProfileViewSerializer(serializers.ModelSerializer):
 
 # ==================== MESSAGING SERIALIZERS ====================
 
+def _request_profile(context):
+    request = context.get('request')
+    if request and hasattr(request, 'user') and hasattr(request.user, 'profile'):
+        return request.user.profile
+    return None
+
+
+class MessageListSerializer(serializers.ListSerializer):
+    """
+    Serializes a page of messages with one read-state query, and each
+    distinct sender once in `senders` rather than nested in every message.
+    Pass include_senders=False in the context when `senders` is not sent.
+    """
+    def to_representation(self, data):
+        messages = list(data.all() if hasattr(data, 'all') else data)
+
+        profile = _request_profile(self.context)
+        if profile:
+            cursors = self.context.setdefault('read_states', {})
+            pending = {m.conversation_id for m in messages} - set(cursors)
+            if pending:
+                states = {
+                    state.conversation_id: state
+                    for state in ReadState.objects.filter(conversation_id__in=pending, profile=profile)
+                }
+                for conversation_id in pending:
+                    cursors[conversation_id] = states.get(conversation_id)
+
+        self.senders = None
+        if not self.context.get('include_senders', True):
+            return [self.child.to_representation(message) for message in messages]
+
+        senders = {}
+        for message in messages:
+            senders.setdefault(message.sender_id, message.sender)
+        self.senders = {
+            card['id']: card
+            for card in ProfileListSerializer(list(senders.values()), many=True, context=self.context).data
+        }
+
+        return [self.child.to_representation(message) for message in messages]
+
+
 class MessageSerializer(serializers.ModelSerializer):
-    """Serializer for messages"""
-    sender = ProfileListSerializer(read_only=True)
-    sender_id = serializers.UUIDField(source='sender.id', read_only=True)
+    """Serializer for messages; senders are referenced by sender_id"""
+    sender_id = serializers.UUIDField(read_only=True)
     is_read = serializers.SerializerMethodField()
     
     class Meta:
         model = Message
-        fields = ['id', 'conversation', 'sender', 'sender_id', 'body', 'is_read', 'created_at']
-        read_only_fields = ['id', 'sender', 'created_at']
+        fields = ['id', 'conversation', 'sender_id', 'body', 'is_read', 'created_at']
+        read_only_fields = ['id', 'created_at']
+        list_serializer_class = MessageListSerializer
         
     def get_is_read(self, obj):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user') and hasattr(request.user, 'profile'):
-            return MessageRead.objects.filter(
-                message=obj,
-                profile=request.user.profile
-            ).exists()
+        profile = _request_profile(self.context)
+        if profile:
+            # One cursor lookup per conversation, shared across the page
+            cursors = self.context.setdefault('read_states', {})
+            if obj.conversation_id not in cursors:
+                cursors[obj.conversation_id] = ReadState.objects.filter(
+                    conversation_id=obj.conversation_id,
+                    profile=profile
+                ).first()
+            state = cursors[obj.conversation_id]
+            return bool(state and state.has_read(obj))
         return False
 
 
 class ConversationListSerializer(serializers.ModelSerializer):
-    """Lightweight serializer for conversation lists"""
+    """
+    Lightweight serializer for conversation lists. Expects a queryset
+    from annotate_conversation_summaries with participants prefetched.
+    """
     participants = ProfileListSerializer(many=True, read_only=True)
     last_message = serializers.SerializerMethodField()
-    unread_count = serializers.SerializerMethodField()
+    unread_count = serializers.IntegerField(read_only=True)
     other_participant = serializers.SerializerMethodField()
     
     class Meta:
@@ -383,49 +443,55 @@ class ConversationListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
         
     def get_last_message(self, obj):
-        last_msg = obj.messages.last()
-        if last_msg:
+        if obj.last_message_id:
             return {
-                'id': str(last_msg.id),
-                'body': last_msg.body,
-                'created_at': last_msg.created_at,
-                'sender_id': str(last_msg.sender.id)
+                'id': str(obj.last_message_id),
+                'body': obj.last_message_preview,
+                'created_at': obj.last_message_at,
+                'sender_id': str(obj.last_message.sender_id)
             }
         return None
         
-    def get_unread_count(self, obj):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user') and hasattr(request.user, 'profile'):
-            profile = request.user.profile
-            unread = obj.messages.exclude(sender=profile).exclude(
-                reads__profile=profile
-            ).count()
-            return unread
-        return 0
-        
     def get_other_participant(self, obj):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user') and hasattr(request.user, 'profile'):
-            current_profile = request.user.profile
-            other = obj.participants.exclude(id=current_profile.id).first()
-            if other:
-                return ProfileListSerializer(other, context=self.context).data
+        # Reuses the prefetched participants rather than querying again
+        other = next((p for p in obj.participants.all() if p.id == obj.other_id), None)
+        if other:
+            return ProfileListSerializer(other, context=self.context).data
         return None
 
 
 class ConversationDetailSerializer(serializers.ModelSerializer):
     """Detailed conversation serializer with messages"""
     participants = ProfileListSerializer(many=True, read_only=True)
-    messages = MessageSerializer(many=True, read_only=True)
+    messages = serializers.SerializerMethodField()
+    older_cursor = serializers.SerializerMethodField()
     other_participant = serializers.SerializerMethodField()
     
     class Meta:
         model = Conversation
         fields = [
             'id', 'participants', 'other_participant',
-            'messages', 'created_at'
+            'messages', 'older_cursor', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
+
+    def _history(self, obj):
+        # Latest page only; older pages come from /api/messages/?before=
+        pages = self.__dict__.setdefault('_history_pages', {})
+        if obj.pk not in pages:
+            pages[obj.pk] = get_message_page(obj.messages.all())
+        return pages[obj.pk]
+
+    def get_messages(self, obj):
+        # Senders are always participants, so messages reference them by
+        # sender_id instead of carrying a senders map
+        page, _ = self._history(obj)
+        context = {**self.context, 'include_senders': False}
+        return MessageSerializer(page, many=True, context=context).data
+
+    def get_older_cursor(self, obj):
+        page, has_older = self._history(obj)
+        return encode_position(page[0].created_at, page[0].id) if has_older else None
         
     def get_other_participant(self, obj):
         request = self.context.get('request')
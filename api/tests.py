@@ -0,0 +1,288 @@
+from datetime import date, timedelta
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+
+
+class DiscoveryPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email="viewer@example.com", password="password")
+        self.client.force_authenticate(self.user)
+
+        now = timezone.now()
+        self.profiles = []
+        for i in range(5):
+            profile = User.objects.create_user(email=f"p{i}@example.com", password="password").profile
+            profile.last_seen = now - timedelta(minutes=i)
+            profile.birth_date = date(1990, 1, 1)
+            profile.save()
+            self.profiles.append(profile)
+
+    def _collect(self, url, results_key, cursor_key, page_size=2):
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': page_size}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(card['id'] for card in response.data[results_key])
+            cursor = response.data[cursor_key]
+            if not cursor:
+                return seen
+
+    def test_discovery_keyset_pages_cover_all_profiles_in_order(self):
+        seen = self._collect('/api/profiles/discovery/', 'results', 'next_cursor')
+        self.assertEqual(seen, [str(p.id) for p in self.profiles])
+
+    def test_deck_serves_prefetched_cards_in_order(self):
+        seen = self._collect('/api/profiles/deck/', 'cards', 'cursor')
+        self.assertEqual(seen, [str(p.id) for p in self.profiles])
+
+    def test_discovery_is_paged_by_default(self):
+        from unittest import mock
+        from api.pagination import DiscoveryCursorPagination
+
+        with mock.patch.object(DiscoveryCursorPagination, 'page_size', 2):
+            response = self.client.get('/api/profiles/discovery/')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next_cursor'])
+
+    def test_unpaged_flag_returns_a_capped_list(self):
+        from unittest import mock
+        from api.pagination import DiscoveryCursorPagination
+
+        with mock.patch.object(DiscoveryCursorPagination, 'max_page_size', 3):
+            response = self.client.get('/api/profiles/discovery/', {'page_size': 1000, 'unpaged': 'true'})
+        self.assertEqual([card['id'] for card in response.data], [str(p.id) for p in self.profiles[:3]])
+
+    def test_prefetched_deck_is_shared_across_workers(self):
+        from api.views import _deck_key
+        from core.cache import ephemeral_cache
+
+        cursor = self.client.get('/api/profiles/deck/', {'page_size': 2}).data['cursor']
+        prefetched = ephemeral_cache.get(_deck_key(self.user.profile.id, cursor, 2))
+        self.assertEqual(prefetched['ids'], [p.id for p in self.profiles[2:4]])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/profiles/discovery/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ConversationMarkReadTests(TestCase):
+    def setUp(self):
+        from messaging.models import Conversation
+        from messaging.services import create_message
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(email="reader@example.com", password="password")
+        self.client.force_authenticate(self.user)
+        self.other = User.objects.create_user(email="writer@example.com", password="password").profile
+
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user.profile, self.other)
+        self.messages = [create_message(self.other, self.conversation, f"message {i}") for i in range(5)]
+        self.url = f'/api/conversations/{self.conversation.id}/mark_read/'
+
+    def test_marks_range_up_to_message(self):
+        response = self.client.post(self.url, {'up_to': str(self.messages[2].id)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['unread_count'], 2)
+        self.assertEqual(response.data['total_unread_count'], 2)
+        self.assertEqual(response.data['last_read_message_id'], str(self.messages[2].id))
+
+    def test_marks_range_up_to_timestamp_and_everything(self):
+        until = self.messages[0].created_at.isoformat()
+        response = self.client.post(self.url, {'until': until}, format='json')
+        self.assertEqual(response.data['unread_count'], 4)
+
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.data['unread_count'], 0)
+
+    def test_rejects_unknown_message(self):
+        response = self.client.post(self.url, {'up_to': 'not-a-message'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class MessageHistoryTests(TestCase):
+    def setUp(self):
+        from messaging.models import Conversation, Message
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(email="historian@example.com", password="password")
+        self.client.force_authenticate(self.user)
+        other = User.objects.create_user(email="chatty@example.com", password="password").profile
+
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user.profile, other)
+        # Identical timestamps exercise the id tie-breaker
+        moment = timezone.now()
+        Message.objects.bulk_create([
+            Message(conversation=self.conversation, sender=other, body=f"m{i}")
+            for i in range(7)
+        ])
+        Message.objects.filter(conversation=self.conversation).update(created_at=moment)
+        self.expected = [
+            str(pk) for pk in Message.objects.filter(conversation=self.conversation)
+            .order_by('created_at', 'id').values_list('id', flat=True)
+        ]
+
+    def test_pages_walk_back_through_history(self):
+        pages, cursor = [], None
+        while True:
+            params = {'conversation_id': str(self.conversation.id), 'page_size': 3}
+            if cursor:
+                params['before'] = cursor
+            response = self.client.get('/api/messages/', params)
+            self.assertEqual(response.status_code, 200)
+            pages.insert(0, [m['id'] for m in response.data['results']])
+            cursor = response.data['older_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual([len(page) for page in pages], [1, 3, 3])
+        self.assertEqual(sum(pages, []), self.expected)
+
+    def test_conversation_detail_embeds_latest_page(self):
+        response = self.client.get(f'/api/conversations/{self.conversation.id}/')
+        self.assertEqual([m['id'] for m in response.data['messages']], self.expected)
+        self.assertIsNone(response.data['older_cursor'])
+
+    def test_conversation_detail_skips_the_senders_map(self):
+        from unittest import mock
+        from api import serializers
+
+        cards = serializers.ProfileCardListSerializer
+        with mock.patch.object(cards, 'to_representation', autospec=True, side_effect=cards.to_representation) as lists:
+            response = self.client.get(f'/api/conversations/{self.conversation.id}/')
+        # Only the participants list; the detail never emits senders
+        self.assertEqual(lists.call_count, 1)
+        self.assertNotIn('senders', response.data)
+
+    def test_page_cost_does_not_grow_with_messages(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def page_queries(page_size):
+            params = {'conversation_id': str(self.conversation.id), 'page_size': page_size}
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/messages/', params)
+            return response, len(queries)
+
+        _, small = page_queries(2)
+        response, large = page_queries(7)
+        self.assertEqual(small, large)
+        self.assertEqual(set(response.data['senders']), {m['sender_id'] for m in response.data['results']})
+        self.assertNotIn('sender', response.data['results'][0])
+
+
+class ConversationListTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email="lister@example.com", password="password")
+        self.client.force_authenticate(self.user)
+
+    def _add_conversation(self, index):
+        from messaging.models import Conversation
+        from messaging.services import create_message
+
+        other = User.objects.create_user(email=f"friend{index}@example.com", password="password").profile
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.user.profile, other)
+        create_message(other, conversation, "first")
+        create_message(other, conversation, f"latest from {index}")
+        return conversation, other
+
+    def _list(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/conversations/')
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_rows_carry_preview_unread_and_other_participant(self):
+        conversation, other = self._add_conversation(0)
+        response, _ = self._list()
+        row = response.data['results'][0]
+        self.assertEqual(row['last_message']['body'], "latest from 0")
+        self.assertEqual(row['last_message']['sender_id'], str(other.id))
+        self.assertEqual(row['unread_count'], 2)
+        self.assertEqual(row['other_participant']['id'], str(other.id))
+
+    def test_query_count_does_not_grow_with_conversations(self):
+        self._add_conversation(0)
+        _, one = self._list()
+        for index in range(1, 5):
+            self._add_conversation(index)
+        _, five = self._list()
+        self.assertEqual(one, five)
+
+
+class PresenceTests(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+        caches['ephemeral'].clear()
+        self.profiles = [
+            User.objects.create_user(email=f"online{i}@example.com", password="password").profile
+            for i in range(4)
+        ]
+
+    def test_online_among_answers_in_one_call(self):
+        from accounts.presence import mark_online, online_among
+        mark_online(self.profiles[0].id)
+        mark_online(self.profiles[2].id)
+        self.assertEqual(
+            online_among([p.id for p in self.profiles]),
+            {self.profiles[0].id, self.profiles[2].id}
+        )
+        self.assertEqual(online_among([]), set())
+
+    def test_profile_cards_share_one_presence_lookup(self):
+        from unittest import mock
+        from accounts.presence import mark_online
+        from api import serializers
+
+        mark_online(self.profiles[1].id)
+        with mock.patch.object(serializers, 'online_among', wraps=serializers.online_among) as lookup:
+            data = serializers.ProfileListSerializer(self.profiles, many=True, context={}).data
+        self.assertEqual(lookup.call_count, 1)
+        self.assertEqual([card['is_online'] for card in data], [False, True, False, False])
+
+
+class BlockApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email="blocker@example.com", password="password")
+        self.other = User.objects.create_user(email="blocked@example.com", password="password").profile
+        self.client.force_authenticate(self.user)
+
+    def test_unblock_restores_discovery(self):
+        from discovery.exclusions import get_excluded_ids
+        from interactions.services import block_user
+
+        me = self.user.profile
+        block = block_user(me, self.other)
+        self.assertIn(self.other.id, get_excluded_ids(me.id))
+        self.assertIn(me.id, get_excluded_ids(self.other.id))
+
+        response = self.client.delete(f"/api/blocks/{block.id}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertNotIn(self.other.id, get_excluded_ids(me.id))
+        self.assertNotIn(me.id, get_excluded_ids(self.other.id))
+
+    def test_api_block_matches_the_service(self):
+        from discovery.exclusions import get_excluded_ids
+        from interactions.models import Match
+
+        me = self.user.profile
+        Match.objects.create(profile1=me, profile2=self.other)
+        response = self.client.post("/api/blocks/", {"blocked_profile_id": str(self.other.id)})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['blocked']['id'], str(self.other.id))
+        self.assertFalse(Match.objects.exists())
+        self.assertIn(self.other.id, get_excluded_ids(me.id))
+        self.assertIn(me.id, get_excluded_ids(self.other.id))
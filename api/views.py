@@ -1,4 +1,4 @@
-from rest_framework import viewsets, status, permissions, filters
+from rest_framework import viewsets, status, permissions, filters, serializers
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -7,14 +7,25 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q, Prefetch
 from django.shortcuts import get_object_or_404
-from datetime import date, datetime, timedelta
+from django.core.exceptions import ValidationError
+from django.utils.dateparse import parse_datetime
+from core.cache import ephemeral_cache as cache
 import requests
 
 from accounts.models import User, Profile, ProfilePhoto
 from discovery.models import Preference
 from interactions.models import Like, Match, Block, Report, Skip, ProfileView
-from messaging.models import Conversation, Message, MessageRead
+from interactions.services import block_user, unblock_user
+from messaging.membership import is_member
+from messaging.models import Conversation, Message
+from messaging.selectors import annotate_conversation_summaries, get_total_unread_count
+from messaging.services import (
+    create_message, get_or_create_pair_conversation, mark_conversation_as_read, mark_message_as_read, mark_read_up_to
+)
+from discovery.exclusions import add_exclusion
+from discovery.query import apply_preferences
 
+from .pagination import DiscoveryCursorPagination, MessageHistoryPagination
 from .serializers import (
     UserSerializer, UserRegistrationSerializer,
     ProfileListSerializer, ProfileDetailSerializer, ProfileUpdateSerializer,
@@ -27,6 +38,12 @@ from .serializers import (
 
 from accounts.constants import GEOGRAPHIC_DATA, COUNTRY_CHOICES, ETHNICITY_CHOICES
 
+DECK_TTL = 5 * 60  # seconds
+
+
+def _deck_key(profile_id, cursor, size):
+    return f"deck:{profile_id}:{size}:{cursor}"
+
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -214,32 +231,7 @@ class ProfileViewSet(viewsets.ModelViewSet):
         
         # Apply preferences if they exist
         if hasattr(current_profile, 'preferences'):
-            prefs = current_profile.preferences
-            
-            # Age filter
-            if prefs.min_age and prefs.max_age:
-                today = date.today()
-                min_birth_date = today.replace(year=today.year - prefs.max_age)
-                max_birth_date = today.replace(year=today.year - prefs.min_age)
-                queryset = queryset.filter(
-                    birth_date__range=[min_birth_date, max_birth_date]
-                )
-            
-            # Gender filter
-            if prefs.interested_in and prefs.interested_in != 'all':
-                queryset = queryset.filter(gender=prefs.interested_in)
-            
-            # City filter
-            if prefs.pref_city:
-                queryset = queryset.filter(city=prefs.pref_city)
-            
-            # Nationality filter
-            if prefs.pref_nationality:
-                queryset = queryset.filter(nationality=prefs.pref_nationality)
-            
-            # Ethnicity filter
-            if prefs.pref_ethnicity and prefs.pref_ethnicity != 'any':
-                queryset = queryset.filter(ethnicity=prefs.pref_ethnicity)
+            queryset = apply_preferences(queryset, current_profile.preferences)
         
         return queryset
     
@@ -308,14 +300,10 @@ class ProfileViewSet(viewsets.ModelViewSet):
         )
         return Response(serializer.data)
     
-    @action(detail=False, methods=['get'])
-    def discovery(self, request):
-        """
-        Get profiles for discovery feed
-        Excludes liked and skipped profiles
-        """
+    def get_discovery_queryset(self):
+        """Discovery candidates: filtered profiles minus liked and skipped ones"""
         queryset = self.get_queryset()
-        current_profile = request.user.profile
+        current_profile = self.request.user.profile
         
         # Exclude already liked profiles
         liked_ids = Like.objects.filter(
@@ -327,27 +315,79 @@ class ProfileViewSet(viewsets.ModelViewSet):
         skipped_ids = Skip.objects.filter(
             from_profile=current_profile
         ).values_list('to_profile_id', flat=True)
-        queryset = queryset.exclude(id__in=skipped_ids)
-        
-        # Order by recent activity
-        queryset = queryset.order_by('-last_seen')
-        
-        # Paginate
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = ProfileListSerializer(
-                page,
-                many=True,
-                context={'request': request}
+        return queryset.exclude(id__in=skipped_ids)
+
+    @action(detail=False, methods=['get'])
+    def discovery(self, request):
+        """
+        Get profiles for discovery feed
+        Excludes liked and skipped profiles
+
+        Keyset-paginated over (last_seen, id), page_size capped at
+        max_page_size. Older clients that expect a bare list can pass
+        `unpaged=true` to get the first page without the envelope.
+        """
+        queryset = self.get_discovery_queryset()
+        paginator = DiscoveryCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = ProfileListSerializer(
+            page,
+            many=True,
+            context={'request': request}
+        )
+        if request.query_params.get('unpaged', '').lower() in ('1', 'true'):
+            return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def deck(self, request):
+        """
+        Get the next deck of discovery cards plus an opaque cursor.
+
+        Each response also resolves the following deck and caches its ids
+        under the returned cursor, so the next swipe batch is served by a
+        primary key lookup instead of a cold filtered scan.
+        """
+        current_profile = request.user.profile
+        paginator = DiscoveryCursorPagination()
+        size = paginator.get_page_size(request)
+        queryset = self.get_discovery_queryset()
+
+        token = request.query_params.get(paginator.cursor_query_param)
+        prefetched = cache.get(_deck_key(current_profile.id, token, size)) if token else None
+
+        if prefetched:
+            # Cards liked or skipped since prefetching drop out here
+            cards = list(
+                queryset.filter(id__in=prefetched['ids']).order_by(*paginator.ordering)
             )
-            return self.get_paginated_response(serializer.data)
-        
+            next_cursor = prefetched['cursor']
+            if next_cursor:
+                rows = list(paginator.after(queryset, paginator.decode_cursor_token(next_cursor))[:size + 1])
+                self._prefetch_deck(current_profile, next_cursor, rows, size)
+        else:
+            rows = list(paginator.after(queryset, paginator.decode_cursor(request))[:size * 2 + 1])
+            cards = rows[:size]
+            next_cursor = paginator.encode_cursor(cards[-1]) if len(rows) > size else None
+            if next_cursor:
+                self._prefetch_deck(current_profile, next_cursor, rows[size:], size)
+
         serializer = ProfileListSerializer(
-            queryset,
+            cards,
             many=True,
             context={'request': request}
         )
-        return Response(serializer.data)
+        return Response({
+            'cards': serializer.data,
+            'cursor': next_cursor,
+        })
+
+    def _prefetch_deck(self, profile, cursor, rows, size):
+        deck = rows[:size]
+        cache.set(_deck_key(profile.id, cursor, size), {
+            'ids': [card.id for card in deck],
+            'cursor': DiscoveryCursorPagination.encode_cursor(deck[-1]) if len(rows) > size else None,
+        }, timeout=DECK_TTL)
     
     @action(detail=False, methods=['get'])
     def who_liked_me(self, request):
@@ -506,19 +546,15 @@ class LikeViewSet(viewsets.ModelViewSet):
                 profile1=p1,
                 profile2=p2
             )
+
+            if match_created:
+                add_exclusion(p1.id, p2.id)
+                add_exclusion(p2.id, p1.id)
             
             is_match = True
             
             # Find or create conversation
-            conversation = Conversation.objects.filter(
-                participants=p1
-            ).filter(
-                participants=p2
-            ).first()
-            
-            if not conversation:
-                conversation = Conversation.objects.create()
-                conversation.participants.add(p1, p2)
+            conversation, _ = get_or_create_pair_conversation(p1, p2)
             
             conversation_id = str(conversation.id)
         else:
@@ -582,15 +618,20 @@ class BlockViewSet(viewsets.ModelViewSet):
         return Block.objects.none()
     
     def perform_create(self, serializer):
-        blocked_profile_id = self.request.data.get('blocked_profile_id')
+        # block_user also drops likes and matches and updates the discovery
+        # and membership caches, exactly as the web block does
+        blocked_profile_id = serializer.validated_data['blocked_profile_id']
         try:
             blocked_profile = Profile.objects.get(id=blocked_profile_id)
-            serializer.save(
-                blocker=self.request.user.profile,
-                blocked=blocked_profile
-            )
         except Profile.DoesNotExist:
             raise serializers.ValidationError({'detail': 'Profile not found.'})
+        block = block_user(self.request.user.profile, blocked_profile)
+        if block is None:
+            raise serializers.ValidationError({'detail': 'You cannot block yourself.'})
+        serializer.instance = block
+
+    def perform_destroy(self, instance):
+        unblock_user(instance.blocker, instance.blocked)
 
 
 class ReportViewSet(viewsets.ModelViewSet):
@@ -645,6 +686,9 @@ class SkipViewSet(viewsets.ModelViewSet):
             from_profile=request.user.profile,
             to_profile=to_profile
         )
+
+        if created:
+            add_exclusion(request.user.profile.id, to_profile.id)
         
         serializer = self.get_serializer(skip)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -659,9 +703,16 @@ class ConversationViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         if hasattr(self.request.user, 'profile'):
-            return Conversation.objects.filter(
-                participants=self.request.user.profile
-            ).prefetch_related('participants', 'messages').order_by('-created_at')
+            profile = self.request.user.profile
+            conversations = Conversation.objects.filter(
+                participants=profile
+            ).prefetch_related('participants').order_by('-last_message_at', '-created_at')
+            if self.action == 'list':
+                conversations = annotate_conversation_summaries(
+                    conversations.select_related('last_message'),
+                    profile
+                )
+            return conversations
         return Conversation.objects.none()
     
     def get_serializer_class(self):
@@ -675,17 +726,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
         
         # Mark all messages in this conversation as read
         if hasattr(request.user, 'profile'):
-            unread_messages = instance.messages.exclude(
-                sender=request.user.profile
-            ).exclude(
-                reads__profile=request.user.profile
-            )
-            
-            for message in unread_messages:
-                MessageRead.objects.get_or_create(
-                    message=message,
-                    profile=request.user.profile
-                )
+            mark_conversation_as_read(request.user.profile, instance)
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -714,35 +755,61 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Check if conversation already exists
-        existing = Conversation.objects.filter(
-            participants=request.user.profile
-        ).filter(
-            participants=other_profile
-        ).first()
-        
-        if existing:
-            serializer = ConversationDetailSerializer(
-                existing,
-                context={'request': request}
-            )
-            return Response(serializer.data)
-        
-        # Create new conversation
-        conversation = Conversation.objects.create()
-        conversation.participants.add(request.user.profile, other_profile)
+        # Existing conversation, or a new one keyed on the pair
+        conversation, created = get_or_create_pair_conversation(request.user.profile, other_profile)
         
         serializer = ConversationDetailSerializer(
             conversation,
             context={'request': request}
         )
+        if not created:
+            return Response(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=True, methods=['post'])
+    def mark_read(self, request, pk=None):
+        """
+        Mark messages as read up to a message id (`up_to`) or an ISO
+        timestamp (`until`); with neither, mark the whole conversation.
+        """
+        conversation = self.get_object()
+        profile = request.user.profile
+
+        message = None
+        until = None
+        if request.data.get('up_to'):
+            try:
+                message = conversation.messages.filter(id=request.data['up_to']).first()
+            except ValidationError:
+                message = None
+            if message is None:
+                return Response(
+                    {'detail': 'Message not found in this conversation.'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        elif request.data.get('until'):
+            until = parse_datetime(str(request.data['until']))
+            if until is None:
+                return Response(
+                    {'detail': 'until must be an ISO 8601 timestamp.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        state = mark_read_up_to(profile, conversation, message=message, until=until)
+        return Response({
+            'conversation_id': str(conversation.id),
+            'last_read_message_id': str(state.last_read_message_id) if state.last_read_message_id else None,
+            'last_read_at': state.last_read_at,
+            'unread_count': state.unread_count,
+            'total_unread_count': get_total_unread_count(profile),
+        })
+
 
 class MessageViewSet(viewsets.ModelViewSet):
-    """ViewSet for messages"""
+    """ViewSet for messages, listed newest page first via ?before= cursors"""
     permission_classes = [IsAuthenticated]
     http_method_names = ['get', 'post']
+    pagination_class = MessageHistoryPagination
     
     def get_queryset(self):
         conversation_id = self.request.query_params.get('conversation_id')
@@ -764,6 +831,13 @@ class MessageViewSet(viewsets.ModelViewSet):
         if self.action == 'create':
             return MessageCreateSerializer
         return MessageSerializer
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response.data['senders'] = serializer.senders
+        return response
     
     def create(self, request, *args, **kwargs):
         """Create a new message"""
@@ -778,14 +852,18 @@ class MessageViewSet(viewsets.ModelViewSet):
         
         # Verify user is participant in conversation
         conversation = serializer.validated_data['conversation']
-        if request.user.profile not in conversation.participants.all():
+        if not is_member(conversation.id, request.user.profile.id):
             return Response(
                 {'detail': 'You are not a participant in this conversation.'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Save with sender
-        message = serializer.save(sender=request.user.profile)
+        # Save with sender, keeping unread counters in step
+        message = create_message(
+            request.user.profile,
+            conversation,
+            serializer.validated_data['body']
+        )
         
         # Return full message data
         return Response(
@@ -799,10 +877,7 @@ class MessageViewSet(viewsets.ModelViewSet):
         message = self.get_object()
         
         if hasattr(request.user, 'profile'):
-            MessageRead.objects.get_or_create(
-                message=message,
-                profile=request.user.profile
-            )
+            mark_message_as_read(request.user.profile, message)
             return Response({'detail': 'Message marked as read.'})
         
         return Response(
@@ -0,0 +1,194 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.connection import ConnectionProxy
+
+# SQLite's default limit on host parameters per statement is 999
+CHUNK_SIZE = 500
+SWEEP_EVERY = 200  # writes per process between sweeps of expired rows
+
+_LIVE = "(expires IS NULL OR expires > ?)"
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache backed by a local SQLite database in WAL mode, shared by every
+    process on the host, for short-lived state such as typing and presence
+    when there is no Redis. add and incr are atomic across processes, and
+    get_many, set_many and delete_many each run as a single statement or
+    transaction.
+
+    LOCATION is the database file path. Integers are stored as SQLite
+    integers so incr can run in SQL; everything else is pickled, so the
+    file is created readable by its owner only and a file owned by anyone
+    else is refused.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _claim_file(self):
+        try:
+            os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+        except FileExistsError:
+            if hasattr(os, 'getuid') and os.stat(self.path).st_uid != os.getuid():
+                raise ImproperlyConfigured(
+                    f"Ephemeral cache file {self.path} is owned by another user; "
+                    "its contents are unpickled, so it will not be used"
+                )
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            self._claim_file()
+            # Autocommit; multi-statement writes open their own transaction
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _dump(value):
+        return value if type(value) is int else pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(value):
+        return value if type(value) is int else pickle.loads(value)
+
+    def _written(self, connection):
+        self._writes += 1
+        if self._writes % SWEEP_EVERY == 0:
+            connection.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+            if self._max_entries:
+                (count,) = connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+                if count > self._max_entries:
+                    # Drop the entries closest to expiry, as the database cache does
+                    connection.execute(
+                        "DELETE FROM cache WHERE key IN "
+                        "(SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)",
+                        (count // self._cull_frequency,)
+                    )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            f"SELECT value FROM cache WHERE key = ? AND {_LIVE}", (key, time.time())
+        ).fetchone()
+        return default if row is None else self._load(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        found = {}
+        connection, now = self._connection(), time.time()
+        stored = list(keys)
+        for i in range(0, len(stored), CHUNK_SIZE):
+            chunk = stored[i:i + CHUNK_SIZE]
+            rows = connection.execute(
+                f"SELECT key, value FROM cache WHERE key IN ({','.join('?' * len(chunk))}) AND {_LIVE}",
+                (*chunk, now)
+            )
+            for key, value in rows:
+                found[keys[key]] = self._load(value)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [(self.make_and_validate_key(key, version=version), self._dump(value), expires) for key, value in data.items()]
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)", rows)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._written(connection)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        connection = self._connection()
+        # Takes over an expired row, never a live one
+        cursor = connection.execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+            "WHERE cache.expires IS NOT NULL AND cache.expires <= ?",
+            (key, self._dump(value), self.get_backend_timeout(timeout), now)
+        )
+        self._written(connection)
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            f"UPDATE cache SET value = value + ? WHERE key = ? AND {_LIVE} AND typeof(value) = 'integer' "
+            "RETURNING value",
+            (delta, key, time.time())
+        ).fetchone()
+        if row is None:
+            raise ValueError("Key '%s' not found" % key)
+        return row[0]
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            f"UPDATE cache SET expires = ? WHERE key = ? AND {_LIVE}",
+            (self.get_backend_timeout(timeout), key, time.time())
+        )
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            f"SELECT 1 FROM cache WHERE key = ? AND {_LIVE}", (key, time.time())
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        return self._delete([self.make_and_validate_key(key, version=version)])
+
+    def delete_many(self, keys, version=None):
+        self._delete([self.make_and_validate_key(key, version=version) for key in keys])
+
+    def _delete(self, keys):
+        deleted = 0
+        connection = self._connection()
+        for i in range(0, len(keys), CHUNK_SIZE):
+            chunk = keys[i:i + CHUNK_SIZE]
+            deleted += connection.execute(
+                f"DELETE FROM cache WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).rowcount
+        return deleted > 0
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def close(self, **kwargs):
+        # Connections are per thread and kept for the life of the process
+        pass
+
+
+# The "ephemeral" alias, resolved per thread like django.core.cache.cache
+ephemeral_cache = ConnectionProxy(caches, 'ephemeral')
+
+
+def ephemeral_cache_is_local():
+    """Whether the ephemeral cache is a per-process locmem cache other processes cannot see"""
+    return isinstance(caches['ephemeral'], LocMemCache)
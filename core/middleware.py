@@ -1,19 +1,123 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
 from rest_framework_simplejwt.tokens import AccessToken
+from whitenoise.middleware import WhiteNoiseMiddleware
 from django.contrib.auth import get_user_model
 import urllib.parse
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_SIZE = 2048
+TOKEN_CACHE_TTL = 60  # seconds; also bounds staleness in other worker processes
+STATS_LOG_EVERY = 1000  # lookups
+
+
+class TokenUserCache:
+    """
+    Per-process LRU of validated access tokens to the user and profile id
+    they resolved to, so reconnect storms skip both the signature check
+    and the user lookup. An entry never outlives its token's exp claim.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, token_key):
+        with self.lock:
+            entry = self.entries.get(token_key)
+            if entry is not None and entry[0] <= time.time():
+                del self.entries[token_key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(token_key)
+                self.hits += 1
+            if (self.hits + self.misses) % STATS_LOG_EVERY == 0:
+                logger.info("WebSocket token cache: %s", self.stats())
+        return entry and (entry[1], entry[2])
+
+    def set(self, token_key, user, profile_id, token_expires_at):
+        expires_at = min(time.time() + self.ttl, token_expires_at)
+        with self.lock:
+            self.entries[token_key] = (expires_at, user, profile_id)
+            self.entries.move_to_end(token_key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def forget_user(self, user_id):
+        with self.lock:
+            stale = [key for key, (_, user, _) in self.entries.items() if user.pk == user_id]
+            for key in stale:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+token_cache = TokenUserCache()
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def forget_blacklisted_user(sender, instance, created, **kwargs):
+    # Access tokens are never blacklisted themselves, so a blacklisted
+    # refresh token (logout, rotation) drops every cached handshake of its user
+    if created and instance.token.user_id:
+        token_cache.forget_user(instance.token.user_id)
+
+
 @database_sync_to_async
-def get_user(token_key):
+def _resolve_token(token_key):
+    token = AccessToken(token_key)
+    user = User.objects.select_related('profile').get(id=token['user_id'])
+    profile = getattr(user, 'profile', None)
+    return user, profile and profile.id, token['exp']
+
+
+async def get_user(token_key):
+    """
+    Resolve a token to (user, profile_id), from token_cache when possible.
+    Invalid or expired tokens and unknown users give (AnonymousUser(), None).
+    """
+    cached = token_cache.get(token_key)
+    if cached is not None:
+        user, profile_id = cached
+        # Each connection gets its own instance; the cached one stays pristine
+        return copy.copy(user), profile_id
     try:
-        token = AccessToken(token_key)
-        user_id = token['user_id']
-        return User.objects.get(id=user_id)
+        user, profile_id, expires_at = await _resolve_token(token_key)
     except Exception:
-        return AnonymousUser()
+        return AnonymousUser(), None
+    token_cache.set(token_key, user, profile_id, expires_at)
+    return copy.copy(user), profile_id
 
 class WebSocketTokenAuthMiddleware:
     def __init__(self, inner):
@@ -24,10 +128,37 @@ class WebSocketTokenAuthMiddleware:
         query_string = scope.get('query_string', b'').decode()
         query_params = urllib.parse.parse_qs(query_string)
         token_key = query_params.get('token', [None])[0]
-        
+
+        # Without a token, AuthMiddlewareStack resolves the session cookie
         if token_key:
-            scope['user'] = await get_user(token_key)
-        else:
-            scope['user'] = AnonymousUser()
-            
+            scope['user'], scope['profile_id'] = await get_user(token_key)
+
         return await self.inner(scope, receive, send)
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that also runs async. The stock middleware is sync-only,
+    which forces everything below it, async views included, onto a worker
+    thread under Daphne.
+    """
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
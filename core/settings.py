@@ -67,7 +67,7 @@ ASGI_APPLICATION = "core.asgi.application"
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -176,17 +176,32 @@ REDIS_URL = os.getenv('REDIS_URL', '')
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "typing-indicators",
+        "LOCATION": "default-cache",
     },
-    "presence": {
-        "BACKEND": "django_redis.cache.RedisCache" if REDIS_URL else "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": REDIS_URL if REDIS_URL else "presence-cache",
+    # Short-lived state that every worker must agree on: typing, presence,
+    # last_seen and chat membership. Redis when available, otherwise a
+    # SQLite file in WAL mode shared by the processes on this host, kept
+    # out of the world-writable temp dir since its values are pickled
+    "ephemeral": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": REDIS_URL,
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
-        } if REDIS_URL else {}
-    }
+        },
+    } if REDIS_URL else {
+        "BACKEND": "core.cache.SQLiteCache",
+        "LOCATION": os.getenv('EPHEMERAL_CACHE_PATH', os.path.join(BASE_DIR, 'ephemeral.sqlite3')),
+    },
 }
 
+# Gives the test suite its own ephemeral cache
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Seconds between last_seen writes per profile. While `manage.py
+# flush_last_seen --interval N` runs they are coalesced in the ephemeral
+# cache and written by it in bulk; without it they are written through
+LAST_SEEN_GRANULARITY = int(os.getenv('LAST_SEEN_GRANULARITY', 60))
+
 # Channel Layers - uses InMemory if Redis is not available
 if REDIS_URL:
     CHANNEL_LAYERS = {
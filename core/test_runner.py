@@ -0,0 +1,29 @@
+import os
+import tempfile
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the suite against a throwaway ephemeral cache. Tests clear it
+    freely, so they must never share the development SQLite file or Redis.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.ephemeral_dir = tempfile.TemporaryDirectory(prefix='test-ephemeral-')
+        self.ephemeral_override = override_settings(CACHES={
+            **settings.CACHES,
+            'ephemeral': {
+                'BACKEND': 'core.cache.SQLiteCache',
+                'LOCATION': os.path.join(self.ephemeral_dir.name, 'ephemeral.sqlite3'),
+            },
+        })
+        self.ephemeral_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.ephemeral_override.disable()
+        self.ephemeral_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
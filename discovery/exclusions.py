@@ -0,0 +1,61 @@
+from core.cache import ephemeral_cache as cache
+from django.db.models import Q
+
+EXCLUSION_TTL = 60 * 60 * 24  # seconds
+
+
+def _exclusion_key(profile_id):
+    return f"discovery:exclusions:{profile_id}"
+
+
+def _build_exclusions(profile_id):
+    """Load every profile id hidden from this profile's discovery feed"""
+    from interactions.models import Match, Skip, Block
+
+    excluded = set()
+
+    for profile1_id, profile2_id in Match.objects.filter(
+        Q(profile1_id=profile_id) | Q(profile2_id=profile_id)
+    ).values_list('profile1_id', 'profile2_id'):
+        excluded.add(profile2_id if profile1_id == profile_id else profile1_id)
+
+    excluded.update(
+        Skip.objects.filter(from_profile_id=profile_id)
+        .values_list('to_profile_id', flat=True)
+    )
+
+    for blocker_id, blocked_id in Block.objects.filter(
+        Q(blocker_id=profile_id) | Q(blocked_id=profile_id)
+    ).values_list('blocker_id', 'blocked_id'):
+        excluded.add(blocked_id if blocker_id == profile_id else blocker_id)
+
+    return frozenset(excluded)
+
+
+def get_excluded_ids(profile_id):
+    """Return the cached exclusion set for a profile, rebuilding it on a miss"""
+    excluded = cache.get(_exclusion_key(profile_id))
+    if excluded is None:
+        excluded = _build_exclusions(profile_id)
+        cache.set(_exclusion_key(profile_id), excluded, timeout=EXCLUSION_TTL)
+    return excluded
+
+
+def add_exclusion(profile_id, *other_ids):
+    """Incrementally extend a cached exclusion set.
+
+    Nothing is written when the set is not cached yet; the next read
+    rebuilds it from the database and already includes the new rows.
+    """
+    excluded = cache.get(_exclusion_key(profile_id))
+    if excluded is None:
+        return
+    cache.set(
+        _exclusion_key(profile_id),
+        excluded.union(other_ids),
+        timeout=EXCLUSION_TTL
+    )
+
+
+def invalidate_exclusions(*profile_ids):
+    cache.delete_many([_exclusion_key(profile_id) for profile_id in profile_ids])
@@ -0,0 +1,85 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.models import User, Profile, generate_discovery_key
+from discovery.models import Preference
+from discovery.sampling import SAMPLING_DAILY, SAMPLING_RANDOM
+from discovery.selectors import get_discovery_profiles
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ORDER BY RANDOM() against the seeded discovery_key walk. "
+        "Synthetic profiles are created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'profiles':>10} {'random (ms)':>12} {'daily (ms)':>12} {'speedup':>8}")
+
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    viewer = self._populate(size, options['batch_size'])
+                    random_ms = self._time(viewer, SAMPLING_RANDOM, options)
+                    daily_ms = self._time(viewer, SAMPLING_DAILY, options)
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+            speedup = random_ms / daily_ms if daily_ms else float('inf')
+            self.stdout.write(f"{size:>10} {random_ms:>12.2f} {daily_ms:>12.2f} {speedup:>7.1f}x")
+
+    def _populate(self, size, batch_size):
+        viewer_user = User.objects.create_user(email='benchmark-viewer@example.com')
+        viewer = viewer_user.profile
+
+        created = 0
+        while created < size:
+            count = min(batch_size, size - created)
+            users = User.objects.bulk_create([
+                User(email=f"benchmark-{created + i}@example.com", password='!')
+                for i in range(count)
+            ])
+            profiles = [
+                Profile(
+                    user=user,
+                    display_name=f"Benchmark {created + i}",
+                    birth_date=date(1960, 1, 1) + timedelta(days=random.randrange(40 * 365)),
+                    is_complete=True,
+                    discovery_key=generate_discovery_key(),
+                )
+                for i, user in enumerate(users)
+            ]
+            # bulk_create skips Profile.save(), which is what fills in age
+            for profile in profiles:
+                profile.age = profile.calculate_age()
+            Profile.objects.bulk_create(profiles)
+            Preference.objects.bulk_create([Preference(profile=profile) for profile in profiles])
+            created += count
+
+        return viewer
+
+    def _time(self, viewer, sampling, options):
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            profiles = get_discovery_profiles(viewer, limit=options['limit'], sampling=sampling)
+            timings.append((time.perf_counter() - start) * 1000)
+            if not profiles:
+                raise CommandError(f"{sampling} sampling returned no profiles; nothing would be timed")
+        return statistics.median(timings)
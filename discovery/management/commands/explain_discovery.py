@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from accounts.models import Profile
+from discovery.models import Preference
+from discovery.query import compile_preference_plan
+
+
+# (label, preference overrides, query shape, index expected per database vendor)
+CANONICAL_QUERIES = [
+    ('web: walk', {'min_age': 0}, 'walk', {
+        'sqlite': 'profile_walk_partial_idx',
+        'mysql': 'profile_disc_walk_idx',
+    }),
+    ('web: age range walk', {}, 'walk', {
+        'sqlite': 'profile_walk_partial_idx',
+        'mysql': 'profile_disc_walk_idx',
+    }),
+    ('web: gender + age walk', {'interested_in': 'female'}, 'walk', {
+        'sqlite': 'profile_gender_partial_idx',
+        'mysql': 'profile_disc_gender_idx',
+    }),
+    ('api: activity keyset', {'min_age': 0}, 'activity', {
+        'sqlite': 'profile_activity_partial_idx',
+        'mysql': 'profile_activity_idx',
+    }),
+    ('api: gender activity keyset', {'min_age': 0, 'interested_in': 'male'}, 'activity', {
+        'sqlite': 'profile_activity_partial_idx',
+        'mysql': 'profile_activity_idx',
+    }),
+]
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN on the canonical discovery queries and report which indexes they use."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print the full query plans")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Database vendor: {connection.vendor}")
+
+        for label, overrides, shape, expected_by_vendor in CANONICAL_QUERIES:
+            expected = expected_by_vendor.get(connection.vendor)
+            plan = self._build(overrides, shape).explain()
+
+            if expected is None:
+                status = self.style.WARNING('not checked on this database')
+            elif expected in plan:
+                status = self.style.SUCCESS('uses')
+            else:
+                status = self.style.ERROR('MISSES')
+
+            self.stdout.write(f"{label:<30} {status} {expected or ''}")
+            if options['verbose_plans']:
+                self.stdout.write(plan)
+
+    def _build(self, overrides, shape):
+        prefs = Preference(**overrides)
+        filters = compile_preference_plan(prefs)
+
+        if shape == 'walk':
+            # Shape of the first batch in discovery.sampling.seeded_walk
+            return (
+                Profile.objects
+                .filter(is_visible=True, is_complete=True, **filters)
+                .filter(Q(discovery_key__gte=0))
+                .order_by('discovery_key', 'id')[:20]
+            )
+
+        # Shape of a DiscoveryCursorPagination page in ProfileViewSet.discovery
+        return (
+            Profile.objects
+            .filter(is_visible=True, **filters)
+            .order_by('-last_seen', '-id')[:21]
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import Profile
+from discovery.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Re-index every profile in the discovery full-text search backend."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        count = 0
+        for profile in Profile.objects.iterator(chunk_size=2000):
+            backend.index_profile(profile)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} profiles with the {backend.name} backend"))
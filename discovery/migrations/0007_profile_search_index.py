@@ -0,0 +1,54 @@
+# Generated by Django 6.0 on 2026-10-18 03:30
+
+import sqlite3
+
+from django.db import migrations
+
+FTS_TABLE = 'discovery_profile_fts'
+MYSQL_FULLTEXT_INDEX = 'profile_search_ft'
+COLUMNS = 'display_name, location, gender, bio'
+
+
+def fts5_available():
+    try:
+        sqlite3.connect(':memory:').execute('CREATE VIRTUAL TABLE probe USING fts5(body)')
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite' and fts5_available():
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"profile_id UNINDEXED, {COLUMNS}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (profile_id, {COLUMNS}) "
+            f"SELECT id, display_name, location, COALESCE(gender, ''), bio FROM accounts_profile"
+        )
+    elif vendor == 'mysql':
+        schema_editor.execute(
+            f"ALTER TABLE accounts_profile ADD FULLTEXT INDEX {MYSQL_FULLTEXT_INDEX} ({COLUMNS})"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'mysql':
+        schema_editor.execute(f"ALTER TABLE accounts_profile DROP INDEX {MYSQL_FULLTEXT_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_profile_age'),
+        ('discovery', '0006_alter_preference_pref_ethnicity'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+FTS_TABLE = 'discovery_profile_fts'
+FTS_DOCS_TABLE = 'discovery_profile_fts_docs'
+COLUMNS = 'display_name, location, gender, bio'
+FTS_OPTIONS = "tokenize='unicode61 remove_diacritics 2', prefix='2 3'"
+
+
+def fts_table_exists(schema_editor):
+    return FTS_TABLE in schema_editor.connection.introspection.table_names()
+
+
+def key_search_rows_by_rowid(apps, schema_editor):
+    # The FTS table only exists where 0007 found FTS5 support
+    if schema_editor.connection.vendor != 'sqlite' or not fts_table_exists(schema_editor):
+        return
+    schema_editor.execute(
+        f"CREATE TABLE {FTS_DOCS_TABLE} (rowid INTEGER PRIMARY KEY, profile_id TEXT NOT NULL UNIQUE)"
+    )
+    schema_editor.execute(f"INSERT INTO {FTS_DOCS_TABLE} (profile_id) SELECT id FROM accounts_profile")
+    schema_editor.execute(f"DROP TABLE {FTS_TABLE}")
+    schema_editor.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({COLUMNS}, {FTS_OPTIONS})")
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, {COLUMNS}) "
+        f"SELECT d.rowid, p.display_name, p.location, COALESCE(p.gender, ''), p.bio "
+        f"FROM {FTS_DOCS_TABLE} d JOIN accounts_profile p ON p.id = d.profile_id"
+    )
+
+
+def key_search_rows_by_profile_id(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite' or not fts_table_exists(schema_editor):
+        return
+    schema_editor.execute(f"DROP TABLE {FTS_TABLE}")
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_DOCS_TABLE}")
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(profile_id UNINDEXED, {COLUMNS}, {FTS_OPTIONS})"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (profile_id, {COLUMNS}) "
+        f"SELECT id, display_name, location, COALESCE(gender, ''), bio FROM accounts_profile"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discovery', '0007_profile_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(key_search_rows_by_rowid, key_search_rows_by_profile_id),
+    ]
@@ -0,0 +1,60 @@
+from core.cache import ephemeral_cache as cache
+
+PLAN_TTL = 60 * 60 * 24  # seconds
+
+
+def _plan_key(profile_id):
+    return f"discovery:plan:{profile_id}"
+
+
+def compile_preference_plan(prefs):
+    """Turn a Preference into the ORM lookups shared by every discovery path"""
+    filters = {}
+
+    # Age reads the precomputed Profile.age column, which the discovery
+    # indexes carry so the range is checked without touching the row
+    if prefs.min_age and prefs.max_age:
+        filters['age__gte'] = prefs.min_age
+        filters['age__lte'] = prefs.max_age
+
+    if prefs.interested_in and prefs.interested_in != 'all':
+        filters['gender'] = prefs.interested_in
+
+    if prefs.pref_ethnicity and prefs.pref_ethnicity != 'any':
+        filters['ethnicity'] = prefs.pref_ethnicity
+
+    # City and nationality come from fixed choice lists, so exact matches
+    # are both correct and index friendly
+    if prefs.pref_city:
+        filters['city'] = prefs.pref_city
+
+    if prefs.pref_max_children is not None:
+        filters['children_count__lte'] = prefs.pref_max_children
+
+    if prefs.pref_nationality and prefs.pref_nationality.lower() != 'any':
+        filters['nationality'] = prefs.pref_nationality
+
+    return filters
+
+
+def get_filter_plan(prefs):
+    """
+    Return the cached plan for these preferences. Plans live in the shared
+    ephemeral cache and are stamped with Preference.updated_at, so a worker
+    holding newer preferences than the cached plan recompiles it.
+    """
+    stamp = prefs.updated_at and prefs.updated_at.isoformat()
+    cached = cache.get(_plan_key(prefs.profile_id))
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    plan = compile_preference_plan(prefs)
+    cache.set(_plan_key(prefs.profile_id), (stamp, plan), timeout=PLAN_TTL)
+    return plan
+
+
+def apply_preferences(queryset, prefs):
+    return queryset.filter(**get_filter_plan(prefs))
+
+
+def invalidate_plan(profile_id):
+    cache.delete(_plan_key(profile_id))
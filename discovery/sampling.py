@@ -0,0 +1,79 @@
+import hashlib
+from types import SimpleNamespace
+from django.db.models import Q
+from django.utils import timezone
+from accounts.models import DISCOVERY_KEY_SPACE
+
+SAMPLING_DAILY = 'daily'    # seeded walk over Profile.discovery_key
+SAMPLING_RANDOM = 'random'  # ORDER BY RANDOM(), kept for comparison
+
+
+def daily_seed(profile_id, day=None):
+    """Stable pivot into the discovery key space for one viewer on one day"""
+    day = day or timezone.now().date()
+    digest = hashlib.sha256(f"{profile_id}:{day.isoformat()}".encode()).digest()
+    return int.from_bytes(digest[:8], 'big') % DISCOVERY_KEY_SPACE
+
+
+def seeded_walk(queryset, seed, limit, excluded_ids=frozenset(), batch_size=None, after=None):
+    """
+    Walk the discovery_key index starting at seed and wrapping around,
+    returning up to limit profiles that are not in excluded_ids.
+
+    after is the (discovery_key, id) of the last profile already shown;
+    the walk resumes just past it and ends, short of limit, once it gets
+    back round to seed.
+
+    Rows are fetched in small keyset batches over (discovery_key, id), so
+    the cost grows with limit and the exclusions hit, not the table size.
+    """
+    batch_size = batch_size or max(limit * 2, 20)
+    picked = []
+
+    segments = [(Q(discovery_key__gte=seed), None), (Q(discovery_key__lt=seed), None)]
+    if after is not None:
+        position = SimpleNamespace(discovery_key=after[0], id=after[1])
+        if position.discovery_key >= seed:
+            segments[0] = (segments[0][0], position)
+        else:
+            segments = [(segments[1][0], position)]
+
+    for segment, last in segments:
+        page_queryset = queryset.filter(segment).order_by('discovery_key', 'id')
+
+        while len(picked) < limit:
+            page = page_queryset
+            if last is not None:
+                page = page.filter(
+                    Q(discovery_key__gt=last.discovery_key) |
+                    Q(discovery_key=last.discovery_key, id__gt=last.id)
+                )
+
+            rows = list(page[:batch_size])
+            for profile in rows:
+                if profile.id in excluded_ids:
+                    continue
+                picked.append(profile)
+                if len(picked) >= limit:
+                    break
+
+            if len(rows) < batch_size:
+                break
+            last = rows[-1]
+
+        if len(picked) >= limit:
+            break
+
+    return picked
+
+
+def random_sample(queryset, limit, excluded_ids=frozenset()):
+    """Legacy ORDER BY RANDOM() sampling with in-memory exclusion filtering"""
+    picked = []
+    for profile in queryset.order_by('?').iterator(chunk_size=max(limit * 4, 50)):
+        if profile.id in excluded_ids:
+            continue
+        picked.append(profile)
+        if len(picked) >= limit:
+            break
+    return picked
@@ -0,0 +1,163 @@
+import re
+import uuid
+from django.conf import settings
+from django.db import connection
+
+MAX_HITS = 5000  # ranked ids fetched per query; how deep a search can page
+FTS_TABLE = 'discovery_profile_fts'
+FTS_DOCS_TABLE = 'discovery_profile_fts_docs'  # profile id <-> FTS rowid
+MYSQL_FULLTEXT_INDEX = 'profile_search_ft'
+
+# (field, weight) pairs, highest weight first
+SEARCH_FIELDS = (
+    ('display_name', 10.0),
+    ('location', 5.0),
+    ('gender', 2.0),
+    ('bio', 1.0),
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return [token.lower() for token in _TOKEN_RE.findall(text or '')]
+
+
+class SQLiteFTSBackend:
+    """
+    SQLite FTS5 virtual table kept in sync from Profile signals. Rows are
+    keyed by rowid, mapped to profile ids in FTS_DOCS_TABLE, so updates and
+    deletes are rowid lookups rather than scans of the FTS table.
+    """
+    name = 'fts5'
+
+    def index_profile(self, profile):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_DOCS_TABLE} (profile_id) VALUES (%s) "
+                f"ON CONFLICT (profile_id) DO UPDATE SET profile_id = excluded.profile_id RETURNING rowid",
+                [profile.id.hex]
+            )
+            (rowid,) = cursor.fetchone()
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [rowid])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, display_name, location, gender, bio) "
+                f"VALUES (%s, %s, %s, %s, %s)",
+                [rowid, profile.display_name, profile.location, profile.gender or '', profile.bio]
+            )
+
+    def remove_profile(self, profile_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_DOCS_TABLE} WHERE profile_id = %s RETURNING rowid", [profile_id.hex]
+            )
+            row = cursor.fetchone()
+            if row is not None:
+                cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [row[0]])
+
+    def search(self, query, limit=MAX_HITS):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # Every token must match, each one as a prefix
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        weights = ', '.join(str(weight) for _, weight in SEARCH_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT d.profile_id FROM {FTS_TABLE} JOIN {FTS_DOCS_TABLE} d ON d.rowid = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s",
+                [match, limit]
+            )
+            return [uuid.UUID(row[0]) for row in cursor.fetchall()]
+
+
+class MySQLFullTextBackend:
+    """InnoDB FULLTEXT index on accounts_profile, maintained by MySQL itself"""
+    name = 'mysql'
+
+    def index_profile(self, profile):
+        pass
+
+    def remove_profile(self, profile_id):
+        pass
+
+    def search(self, query, limit=MAX_HITS):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # Tokens shorter than innodb_ft_min_token_size are ignored by MySQL
+        against = ' '.join(f'+{token}*' for token in tokens)
+        columns = ', '.join(field for field, _ in SEARCH_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM accounts_profile "
+                f"WHERE MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE) "
+                f"ORDER BY MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE) DESC LIMIT %s",
+                [against, against, limit]
+            )
+            return [uuid.UUID(str(row[0])) for row in cursor.fetchall()]
+
+
+class PythonBackend:
+    """Fallback that scores prefix matches in Python over a single table scan"""
+    name = 'python'
+
+    def index_profile(self, profile):
+        pass
+
+    def remove_profile(self, profile_id):
+        pass
+
+    def search(self, query, limit=MAX_HITS):
+        from accounts.models import Profile
+
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        fields = [field for field, _ in SEARCH_FIELDS]
+        scored = []
+        for row in Profile.objects.values_list('id', *fields).iterator(chunk_size=2000):
+            field_tokens = [tokenize(value) for value in row[1:]]
+            score = 0.0
+            for token in tokens:
+                hits = [
+                    weight for (_, weight), words in zip(SEARCH_FIELDS, field_tokens)
+                    if any(word.startswith(token) for word in words)
+                ]
+                if not hits:
+                    break
+                score += sum(hits)
+            else:
+                scored.append((score, row[0]))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [profile_id for _, profile_id in scored[:limit]]
+
+
+_BACKENDS = {
+    SQLiteFTSBackend.name: SQLiteFTSBackend,
+    MySQLFullTextBackend.name: MySQLFullTextBackend,
+    PythonBackend.name: PythonBackend,
+}
+
+
+_detected = {}
+
+
+def get_search_backend():
+    """Pick the search backend for the default database"""
+    name = getattr(settings, 'DISCOVERY_SEARCH_BACKEND', None)
+    if not name:
+        # Detect once per database; the FTS table only exists where the
+        # migration found FTS5 support
+        database = connection.settings_dict['NAME']
+        if database not in _detected:
+            if connection.vendor == 'mysql':
+                _detected[database] = MySQLFullTextBackend.name
+            elif connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+                _detected[database] = SQLiteFTSBackend.name
+            else:
+                _detected[database] = PythonBackend.name
+        name = _detected[database]
+    return _BACKENDS[name]()
@@ -1,39 +1,24 @@
 from accounts.models import Profile
-from interactions.models import Like, Match, Skip, Block
-from datetime import datetime, timedelta
-from django.utils import timezone
-from django.db.models import Q
-
-
-def get_discovery_profiles(for_profile, limit=10):
-    """Get profiles for discovery feed, filtered by user preferences"""
-    excluded_profiles = set()
-
-    # Exclude matched profiles
-    excluded_profiles.update(
-        Match.objects.filter(profile1=for_profile)
-        .values_list('profile2__id', flat=True)
-    )
-    excluded_profiles.update(
-        Match.objects.filter(profile2=for_profile)
-        .values_list('profile1__id', flat=True)
-    )
-    
-    # Exclude skipped profiles
-    excluded_profiles.update(
-        Skip.objects.filter(from_profile=for_profile)
-        .values_list('to_profile_id', flat=True)
-    )
-
-    # Exclude blocked/blocker profiles
-    excluded_profiles.update(
-        Block.objects.filter(blocker=for_profile)
-        .values_list('blocked_id', flat=True)
-    )
-    excluded_profiles.update(
-        Block.objects.filter(blocked=for_profile)
-        .values_list('blocker_id', flat=True)
-    )
+from django.core.paginator import Paginator
+from django.db.models import Exists, OuterRef
+from interactions.models import Like, Block
+from .exclusions import get_excluded_ids
+from .query import apply_preferences
+from .search import get_search_backend
+from .sampling import SAMPLING_DAILY, SAMPLING_RANDOM, daily_seed, random_sample, seeded_walk
+
+ELIGIBILITY_CHUNK = 500  # ranked ids per eligibility query
+
+
+def get_discovery_profiles(for_profile, limit=10, sampling=SAMPLING_DAILY, after=None):
+    """
+    Get profiles for discovery feed, filtered by user preferences. With
+    daily sampling, pass the (discovery_key, id) of the last profile shown
+    as after to get the next profiles in today's order.
+    """
+    # Matches, skips and blocks come from the maintained exclusion index
+    # instead of being shipped back to the database as a NOT IN list
+    excluded_profiles = get_excluded_ids(for_profile.id)
 
     # Get user's preferences
     try:
@@ -44,73 +29,55 @@ def get_discovery_profiles(for_profile, limit=10):
         prefs = Preference.objects.create(profile=for_profile)
 
     # Build queryset with preference filters
-    from django.db.models import Exists, OuterRef
     queryset = (
         Profile.objects
         .filter(is_visible=True, user__is_active=True, is_complete=True)
-        .exclude(id__in=excluded_profiles)
         .exclude(id=for_profile.id)
         .annotate(
             is_liked=Exists(Like.objects.filter(from_profile=for_profile, to_profile=OuterRef('pk')))
         )
     )
 
-    # Filter by age if birth_date is set
-    if prefs.min_age and prefs.max_age:
-        today = timezone.now().date()
-        min_birth_date = today - timedelta(days=prefs.max_age * 365.25)
-        max_birth_date = today - timedelta(days=prefs.min_age * 365.25)
-        queryset = queryset.filter(
-            birth_date__isnull=False,
-            birth_date__gte=min_birth_date,
-            birth_date__lte=max_birth_date
-        )
-
-    # Filter by gender preference
-    if prefs.interested_in and prefs.interested_in != 'all':
-        queryset = queryset.filter(gender=prefs.interested_in)
-
-    # Filter by ethnicity preference
-    if prefs.pref_ethnicity and prefs.pref_ethnicity != 'any':
-        queryset = queryset.filter(ethnicity=prefs.pref_ethnicity)
-
-    # Filter by city preference
-    if prefs.pref_city:
-        queryset = queryset.filter(city__icontains=prefs.pref_city)
-
-    # Filter by children count preference
-    if prefs.pref_max_children is not None:
-        queryset = queryset.filter(children_count__lte=prefs.pref_max_children)
-
-    # Filter by nationality preference (using icontains for flexibility)
-    if prefs.pref_nationality and prefs.pref_nationality.lower() != 'any':
-        queryset = queryset.filter(nationality__icontains=prefs.pref_nationality)
+    # Age, gender, ethnicity, city, children and nationality
+    queryset = apply_preferences(queryset, prefs)
 
     # Only show profiles that have opted into discovery
     queryset = queryset.filter(preferences__show_me=True)
 
-    return queryset.order_by('?')[:limit]  # Random order
+    if sampling == SAMPLING_RANDOM:
+        return random_sample(queryset, limit, excluded_profiles)
+
+    # Stable shuffled order per viewer per day, served from the discovery_key index
+    return seeded_walk(queryset, daily_seed(for_profile.id), limit, excluded_profiles, after=after)
 
 
-def search_profiles(query, for_profile=None):
-    """Search for profiles by name, location, or bio"""
+def search_profiles(query, for_profile=None, page=1, per_page=20):
+    """Ranked full-text search by name, location, bio or gender, one page at a time"""
     queryset = Profile.objects.filter(
         is_complete=True,
         is_visible=True,
-        user__is_active=True
+        user__is_active=True,
+        preferences__show_me=True
     )
     
-    # Exclude self if for_profile is provided
+    # Exclude self and anyone blocked in either direction
     if for_profile:
-        queryset = queryset.exclude(id=for_profile.id)
-    
-    # Search across multiple fields
-    if query:
-        queryset = queryset.filter(
-            Q(display_name__icontains=query) |
-            Q(location__icontains=query) |
-            Q(bio__icontains=query) |
-            Q(gender__icontains=query)
+        queryset = queryset.exclude(id=for_profile.id).exclude(
+            Exists(Block.objects.filter(blocker=for_profile, blocked=OuterRef('pk')))
+        ).exclude(
+            Exists(Block.objects.filter(blocker=OuterRef('pk'), blocked=for_profile))
         )
     
-    return queryset.select_related('user')[:50]  # Limit results
+    # Eligibility is checked on ids alone, a chunk at a time to stay under
+    # SQLite's parameter limit; only the requested page's rows are loaded
+    ranked_ids = get_search_backend().search(query) if query else []
+    eligible = set()
+    for i in range(0, len(ranked_ids), ELIGIBILITY_CHUNK):
+        eligible.update(
+            queryset.filter(id__in=ranked_ids[i:i + ELIGIBILITY_CHUNK]).values_list('id', flat=True)
+        )
+
+    page = Paginator([profile_id for profile_id in ranked_ids if profile_id in eligible], per_page).get_page(page)
+    profiles = Profile.objects.select_related('user').in_bulk(page.object_list)
+    page.object_list = [profiles[profile_id] for profile_id in page.object_list if profile_id in profiles]
+    return page
@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from accounts.models import Profile
 from .models import Preference
+from .query import invalidate_plan
+from .search import SEARCH_FIELDS, get_search_backend
 
 
 @receiver(post_save, sender=Profile)
@@ -9,3 +11,23 @@ def create_preferences(sender, instance, created, **kwargs):
     """Auto-create preferences when a profile is created"""
     if created:
         Preference.objects.get_or_create(profile=instance)
+
+
+@receiver(post_save, sender=Profile)
+def index_profile_for_search(sender, instance, update_fields=None, **kwargs):
+    """Keep the full-text search index in step with profile edits"""
+    if update_fields and not set(update_fields) & {field for field, _ in SEARCH_FIELDS}:
+        return
+    get_search_backend().index_profile(instance)
+
+
+@receiver(post_delete, sender=Profile)
+def remove_profile_from_search(sender, instance, **kwargs):
+    get_search_backend().remove_profile(instance.id)
+
+
+@receiver(post_save, sender=Preference)
+@receiver(post_delete, sender=Preference)
+def invalidate_preference_plan(sender, instance, **kwargs):
+    """Drop the cached discovery filter plan when preferences change"""
+    invalidate_plan(instance.profile_id)
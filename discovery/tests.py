@@ -1,3 +1,140 @@
+from datetime import date, timedelta
 from django.test import TestCase
+from django.contrib.auth import get_user_model
+from discovery.models import Preference
+from discovery.sampling import daily_seed
+from discovery.selectors import get_discovery_profiles
 
-# Create your tests here.
+User = get_user_model()
+
+
+class DiscoverySamplingTests(TestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user(email="viewer@example.com", password="password").profile
+        self.candidates = []
+        for i in range(12):
+            profile = User.objects.create_user(email=f"c{i}@example.com", password="password").profile
+            profile.is_complete = True
+            profile.birth_date = date(1990, 1, 1)
+            profile.save()
+            self.candidates.append(profile)
+
+    def test_daily_seed_is_stable_per_viewer_and_day(self):
+        today = date(2026, 1, 1)
+        self.assertEqual(daily_seed(self.viewer.id, today), daily_seed(self.viewer.id, today))
+        self.assertNotEqual(
+            daily_seed(self.viewer.id, today),
+            daily_seed(self.viewer.id, today + timedelta(days=1))
+        )
+
+    def test_daily_sampling_pages_through_a_stable_order(self):
+        walk = get_discovery_profiles(self.viewer, limit=50)
+        first = get_discovery_profiles(self.viewer, limit=5)
+        self.assertEqual([p.id for p in first], [p.id for p in walk[:5]])
+
+        # Resuming after the last card shown continues the same order and
+        # stops once it gets back round to the start
+        seen, after = [], None
+        while True:
+            page = get_discovery_profiles(self.viewer, limit=5, after=after)
+            seen.extend(page)
+            if len(page) < 5:
+                break
+            after = (page[-1].discovery_key, page[-1].id)
+        self.assertEqual([p.id for p in seen], [p.id for p in walk])
+
+    def test_daily_sampling_wraps_around_key_space(self):
+        profiles = get_discovery_profiles(self.viewer, limit=50)
+        self.assertEqual({p.id for p in profiles}, {p.id for p in self.candidates})
+
+
+class PreferencePlanTests(TestCase):
+    def setUp(self):
+        self.profile = User.objects.create_user(email="planner@example.com", password="password").profile
+        self.prefs = self.profile.preferences
+
+    def test_age_preferences_use_precomputed_age(self):
+        from discovery.query import compile_preference_plan
+
+        self.prefs.min_age, self.prefs.max_age = 25, 30
+        filters = compile_preference_plan(self.prefs)
+        self.assertEqual(filters['age__gte'], 25)
+        self.assertEqual(filters['age__lte'], 30)
+
+    def test_profile_age_handles_leap_day_birthdays(self):
+        self.profile.birth_date = date(2000, 2, 29)
+        self.assertEqual(self.profile.calculate_age(date(2025, 2, 28)), 24)
+        self.assertEqual(self.profile.calculate_age(date(2025, 3, 1)), 25)
+
+    def test_plan_cache_invalidated_on_save(self):
+        from discovery.query import get_filter_plan
+
+        self.assertNotIn('city', get_filter_plan(self.prefs))
+        self.prefs.pref_city = 'Harare'
+        self.prefs.save()
+        self.assertEqual(get_filter_plan(self.prefs)['city'], 'Harare')
+
+    def test_plan_cache_follows_preference_updates_it_was_not_told_about(self):
+        from django.utils import timezone
+        from discovery.query import get_filter_plan
+
+        self.assertNotIn('city', get_filter_plan(self.prefs))
+        # A bulk update skips post_save, as a change made elsewhere would
+        Preference.objects.filter(id=self.prefs.id).update(pref_city='Harare', updated_at=timezone.now())
+        self.prefs.refresh_from_db()
+        self.assertEqual(get_filter_plan(self.prefs)['city'], 'Harare')
+
+
+class ProfileSearchTests(TestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user(email="searcher@example.com", password="password").profile
+        self.alice = self._profile("alice@example.com", "Alice Moyo", "Loves hiking in Harare")
+        self.alicia = self._profile("alicia@example.com", "Alicia", "Bookworm")
+        self.bob = self._profile("bob@example.com", "Bob", "Hiking every weekend")
+
+    def _profile(self, email, name, bio):
+        profile = User.objects.create_user(email=email, password="password").profile
+        profile.display_name = name
+        profile.bio = bio
+        profile.is_complete = True
+        profile.save()
+        return profile
+
+    def _search(self, query, **kwargs):
+        from discovery.selectors import search_profiles
+        return list(search_profiles(query, for_profile=self.viewer, **kwargs))
+
+    def test_prefix_match_ranks_name_above_bio(self):
+        carol = self._profile("carol@example.com", "Carol", "Alison is my sister")
+        results = self._search("ali")
+        self.assertEqual(set(results[:2]), {self.alice, self.alicia})
+        self.assertEqual(results[2], carol)
+        self.assertEqual(set(self._search("hik")), {self.alice, self.bob})
+
+    def test_index_follows_profile_edits(self):
+        self.bob.display_name = "Robert"
+        self.bob.save()
+        self.assertEqual(self._search("robert"), [self.bob])
+        self.assertEqual(self._search("bob"), [])
+
+    def test_deleted_profiles_leave_the_index(self):
+        from discovery.search import get_search_backend
+
+        self.bob.user.delete()
+        self.assertEqual(get_search_backend().search("hik"), [self.alice.id])
+
+    def test_blocked_and_hidden_profiles_are_excluded(self):
+        from interactions.services import block_user
+
+        block_user(self.alicia, self.viewer)
+        self.alice.is_visible = False
+        self.alice.save()
+        self.assertEqual(self._search("ali"), [])
+
+    def test_results_are_paged(self):
+        from discovery.selectors import search_profiles
+
+        first = search_profiles("hik", for_profile=self.viewer, per_page=1)
+        second = search_profiles("hik", for_profile=self.viewer, page=2, per_page=1)
+        self.assertEqual(first.paginator.count, 2)
+        self.assertEqual({*first, *second}, {self.alice, self.bob})
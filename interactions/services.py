@@ -1,8 +1,10 @@
 from django.db import transaction
 from django.contrib.auth import get_user_model
 from .models import Like, Match, Block, Report, Skip
-from messaging.models import Conversation
+from messaging.membership import invalidate_pair_membership
+from messaging.services import get_or_create_pair_conversation
 from accounts.models import Profile
+from discovery.exclusions import add_exclusion, invalidate_exclusions
 
 
 @transaction.atomic
@@ -36,8 +38,9 @@ def handle_like(from_profile: Profile, to_profile: Profile):
         )
 
         if match_created:
-            conversation = Conversation.objects.create()
-            conversation.participants.add(p1, p2)
+            transaction.on_commit(lambda: _exclude_pair(p1.id, p2.id))
+
+            get_or_create_pair_conversation(p1, p2)
             
             # Send match notification emails
             from accounts.emails import send_match_notification_email
@@ -58,6 +61,9 @@ def skip_user(from_profile: Profile, to_profile: Profile):
         from_profile=from_profile,
         to_profile=to_profile
     )
+
+    if created:
+        add_exclusion(from_profile.id, to_profile.id)
     return skip
 
 
@@ -79,6 +85,9 @@ def block_user(blocker: Profile, blocked: Profile):
     # Remove matches
     Match.objects.filter(profile1=blocker, profile2=blocked).delete()
     Match.objects.filter(profile1=blocked, profile2=blocker).delete()
+
+    _exclude_pair(blocker.id, blocked.id)
+    invalidate_pair_membership(blocker.id, blocked.id)
     
     return block
 
@@ -86,6 +95,14 @@ def block_user(blocker: Profile, blocked: Profile):
 def unblock_user(blocker: Profile, blocked: Profile):
     """Unblock a user"""
     Block.objects.filter(blocker=blocker, blocked=blocked).delete()
+    invalidate_exclusions(blocker.id, blocked.id)
+    invalidate_pair_membership(blocker.id, blocked.id)
+
+
+def _exclude_pair(profile_a_id, profile_b_id):
+    """Hide two profiles from each other's discovery feed"""
+    add_exclusion(profile_a_id, profile_b_id)
+    add_exclusion(profile_b_id, profile_a_id)
 
 
 def is_blocked(profile1: Profile, profile2: Profile):
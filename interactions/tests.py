@@ -168,3 +168,17 @@ class DiscoverySelectorTests(TestCase):
         profiles = get_discovery_profiles(self.p1)
         self.assertNotIn(self.p2, profiles)
         self.assertIn(self.p3, profiles)
+
+    def test_discovery_exclusions_follow_blocks(self):
+        from discovery.selectors import get_discovery_profiles
+        from interactions.services import unblock_user
+
+        # Warm the cached exclusion index before blocking
+        self.assertIn(self.p3, get_discovery_profiles(self.p1))
+
+        block_user(self.p3, self.p1)
+        self.assertNotIn(self.p3, get_discovery_profiles(self.p1))
+        self.assertNotIn(self.p1, get_discovery_profiles(self.p3))
+
+        unblock_user(self.p3, self.p1)
+        self.assertIn(self.p3, get_discovery_profiles(self.p1))
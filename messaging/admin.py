@@ -1,7 +1,7 @@
 from django.contrib import admin
 
-from .models import Conversation, Message, MessageRead
+from .models import Conversation, Message, ReadState
 
 admin.site.register(Conversation)
 admin.site.register(Message)
-admin.site.register(MessageRead)
+admin.site.register(ReadState)
@@ -1,12 +1,58 @@
+import asyncio
 import json
+import urllib.parse
+from datetime import datetime
+from types import SimpleNamespace
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.template.loader import get_template
+from accounts.presence import HEARTBEAT_INTERVAL, amark_online
+from .membership import aget_members
+from .pipeline import enqueue_message
+from .typing import TYPING_RATE_LIMIT, TYPING_RATE_WINDOW, aclear_typing, aset_typing, typing_event
+
+PAYLOAD_FORMATS = ("json", "html")
+
+_message_fragment = None
+
+
+def message_fragment():
+    """The message bubble template, loaded and compiled once per process"""
+    global _message_fragment
+    if _message_fragment is None:
+        _message_fragment = get_template('web/messaging/partials/message.html')
+    return _message_fragment
+
+
+def render_chat_message(event, profile_id):
+    """Render a chat_message event as an HTMX out-of-band append to #messages"""
+    message = SimpleNamespace(
+        sender=event["sender_id"],
+        body=event["message"],
+        created_at=datetime.fromisoformat(event["timestamp"]),
+    )
+    html = message_fragment().render({'message': message, 'profile': str(profile_id)})
+    return f'<div id="messages" hx-swap-oob="beforeend">{html}</div>'
+
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.room_id = self.scope["url_route"]["kwargs"]["room_id"]
         self.room_group_name = f"chat_{self.room_id}"
 
+        # HTMX pages ask for ?format=html; API and mobile sockets get JSON only
+        query = urllib.parse.parse_qs(self.scope.get("query_string", b"").decode())
+        self.payload_format = query.get("format", ["json"])[0]
+        if self.payload_format not in PAYLOAD_FORMATS:
+            self.payload_format = "json"
+
+        # Warms the membership cache that every later event is checked against
+        self.profile_id = self.scope.get("profile_id") or await self.get_profile_id()
+        if self.profile_id is None or self.profile_id not in await aget_members(self.room_id):
+            self.profile_id = None
+            await self.close()
+            return
+
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
@@ -14,32 +60,43 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         await self.accept()
 
-        # user came online
-        if self.scope["user"].is_authenticated:
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    "type": "user_status",
-                    "status": "online",
-                    "user": str(self.scope["user"].id),
-                }
-            )
+        # user came online, and stays so for as long as the socket is open
+        self.heartbeat = asyncio.create_task(self.keep_online())
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                "type": "user_status",
+                "status": "online",
+                "user": str(self.profile_id),
+            }
+        )
 
     async def disconnect(self, close_code):
+        if getattr(self, "profile_id", None) is None:
+            # Rejected in connect, never joined the group
+            return
+
+        # Presence is left to expire rather than cleared, another tab may still be open
+        self.heartbeat.cancel()
+
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
 
-        if self.scope["user"].is_authenticated:
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    "type": "user_status",
-                    "status": "offline",
-                    "user": str(self.scope["user"].id),
-                }
-            )
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                "type": "user_status",
+                "status": "offline",
+                "user": str(self.profile_id),
+            }
+        )
+
+    async def keep_online(self):
+        while True:
+            await amark_online(self.profile_id)
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
 
     async def receive(self, text_data):
         try:
@@ -49,75 +106,91 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return
 
         message_type = data.get("type")
-        
+
+        # Over-eager keystroke streams are dropped before any cache work
+        if message_type == "typing" and not self.typing_within_rate():
+            return
+
+        # Membership is re-checked per event so a block takes effect on open sockets
+        if message_type in ("typing", "chat_message") and not await self.is_still_member():
+            await self.send_error(data.get("client_id"), "You are not a participant in this conversation.")
+            await self.close()
+            return
+
         if message_type == "typing":
-            if self.scope["user"].is_authenticated:
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        "type": "typing_indicator",
-                        "user": str(self.scope["user"].id),
-                    }
-                )
+            if await aset_typing(self.room_id, self.profile_id):
+                await self.channel_layer.group_send(self.room_group_name, typing_event(self.profile_id))
         elif message_type == "chat_message":
-            message_content = data.get("message")
-            if message_content and self.scope["user"].is_authenticated:
-                try:
-                    # Save to DB asynchronously
-                    db_message = await self.save_message(message_content)
-                    
-                    if db_message:
-                        # Broadcast to group
-                        await self.channel_layer.group_send(
-                            self.room_group_name,
-                            {
-                                "type": "chat_message",
-                                "id": str(db_message['id']),
-                                # Crucial: sender_id must match the frontend user.id (which is Profile ID)
-                                "sender_id": str(db_message['sender_profile_id']),
-                                "message": message_content,
-                                "timestamp": db_message['timestamp'],
-                                "html": db_message['html'],
-                            }
-                        )
-                except Exception as e:
-                    print(f"Error in chat_message receive: {str(e)}")
+            await self.accept_chat_message(data)
         else:
             print(f"Unknown message type: {message_type}")
 
-    @database_sync_to_async
-    def save_message(self, content):
-        from .models import Conversation, Message
-        from django.template.loader import render_to_string
+    async def is_still_member(self):
+        return self.profile_id in await aget_members(self.room_id)
+
+    def typing_within_rate(self):
+        """At most TYPING_RATE_LIMIT typing frames per TYPING_RATE_WINDOW on this socket"""
+        now = asyncio.get_running_loop().time()
+        if now - getattr(self, "typing_window_start", -TYPING_RATE_WINDOW) >= TYPING_RATE_WINDOW:
+            self.typing_window_start, self.typing_frames = now, 0
+        self.typing_frames += 1
+        return self.typing_frames <= TYPING_RATE_LIMIT
+
+    async def accept_chat_message(self, data):
+        """
+        Validate and queue a message, then ack it with its server-assigned
+        id straight away. Storage and the broadcast to the group happen in
+        batches on the conversation's write queue; if storing fails the
+        client gets an error frame for the same client_id.
+        """
+        client_id = data.get("client_id")
+
         try:
-            user = self.scope["user"]
-            profile = user.profile
-            conversation = Conversation.objects.get(id=self.room_id)
-            
-            db_message = Message.objects.create(
-                conversation=conversation,
-                sender=profile,
-                body=content
-            )
-
-            # Render HTML for Web clients
-            html = render_to_string('web/messaging/partials/message.html', {
-                'message': db_message,
-                'profile': None
-            })
-            oob_html = f'<div id="messages" hx-swap-oob="beforeend">{html}</div>'
-
-            return {
-                'id': db_message.id,
-                'sender_profile_id': profile.id,
-                'timestamp': db_message.created_at.isoformat(),
-                'html': oob_html
-            }
-        except Exception as e:
-            print(f"Error saving message to DB: {str(e)}")
+            pending = enqueue_message(self.room_id, self.profile_id, data.get("message"))
+        except ValueError as e:
+            await self.send_error(client_id, str(e))
+            return
+
+        # Sending ends typing, so long-polling clients do not see it linger
+        await aclear_typing(self.room_id, self.profile_id)
+
+        await self.send(text_data=json.dumps({
+            "type": "ack",
+            "client_id": client_id,
+            "id": str(pending.id),
+            "timestamp": pending.created_at.isoformat(),
+        }))
+        pending.persisted.add_done_callback(lambda persisted: self.report_lost_message(persisted, client_id))
+
+    def report_lost_message(self, persisted, client_id):
+        # Retrieving the exception also keeps asyncio from logging it as unhandled
+        if persisted.cancelled() or persisted.exception() is None:
+            return
+        task = asyncio.create_task(self.send_error(client_id, "Message could not be saved, please resend it."))
+        # The loop only holds tasks weakly
+        self.error_reports = getattr(self, "error_reports", set())
+        self.error_reports.add(task)
+        task.add_done_callback(self.error_reports.discard)
+
+    async def send_error(self, client_id, detail):
+        await self.send(text_data=json.dumps({
+            "type": "error",
+            "client_id": client_id,
+            "detail": detail,
+        }))
+
+    @database_sync_to_async
+    def get_profile_id(self):
+        """The connecting user's profile id, or None for anonymous users"""
+        from accounts.models import Profile
+        user = self.scope["user"]
+        if not user.is_authenticated:
             return None
+        return Profile.objects.filter(user=user).values_list('id', flat=True).first()
 
     async def typing_indicator(self, event):
+        if event["user"] == str(self.profile_id):
+            return
         await self.send(text_data=json.dumps({
             "type": "typing",
             "user": str(event["user"]),
@@ -130,14 +203,23 @@ class ChatConsumer(AsyncWebsocketConsumer):
             "status": event["status"],
         }))
 
+    async def read_receipt(self, event):
+        await self.send(text_data=json.dumps({
+            "type": "read_receipt",
+            "reader_id": event["reader_id"],
+            "last_read_message_id": event["last_read_message_id"],
+            "last_read_at": event["last_read_at"],
+        }))
+
     async def chat_message(self, event):
-        """Send message data as JSON to the client"""
+        """Send message data as JSON, with the rendered bubble for HTML sockets"""
         data = {
             "type": "chat_message",
             "id": event.get("id"),
             "sender_id": event.get("sender_id"),
             "message": event.get("message", ""),
             "timestamp": event.get("timestamp"),
-            "html": event.get("html"),
         }
+        if self.payload_format == "html":
+            data["html"] = render_chat_message(event, self.profile_id)
         await self.send(text_data=json.dumps(data))
@@ -0,0 +1,85 @@
+import asyncio
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from messaging.models import Conversation
+from messaging.pipeline import enqueue_message
+from messaging.services import chat_message_event, create_message, get_or_create_pair_conversation
+
+
+@database_sync_to_async
+def _store_one(conversation_id, sender, body):
+    # What ChatConsumer.save_message did per message before the write queue
+    conversation = Conversation.objects.get(id=conversation_id)
+    return chat_message_event(create_message(sender, conversation, body))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare one-write-per-message chat persistence with the batched write queue. "
+        "Synthetic users and conversations are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=10)
+        parser.add_argument('--messages', type=int, default=200, help="Messages per conversation")
+
+    def handle(self, *args, **options):
+        pairs = self._populate(options['conversations'])
+        try:
+            self.stdout.write(f"{'path':>10} {'messages':>9} {'total (s)':>10} {'msg/s':>9} {'p50 ack (ms)':>13}")
+            for name, run in (('direct', self._direct), ('pipeline', self._pipeline)):
+                total, acks = async_to_sync(run)(pairs, options['messages'])
+                count = len(acks)
+                self.stdout.write(
+                    f"{name:>10} {count:>9} {total:>10.2f} {count / total:>9.0f} "
+                    f"{statistics.median(acks) * 1000:>13.2f}"
+                )
+        finally:
+            User.objects.filter(email__startswith='chat-benchmark-').delete()
+
+    def _populate(self, count):
+        pairs = []
+        for i in range(count):
+            a = User.objects.create_user(email=f"chat-benchmark-{i}a@example.com").profile
+            b = User.objects.create_user(email=f"chat-benchmark-{i}b@example.com").profile
+            conversation, _ = get_or_create_pair_conversation(a, b)
+            pairs.append((conversation.id, a, b))
+        return pairs
+
+    async def _direct(self, pairs, per_conversation):
+        channel_layer = get_channel_layer()
+        acks = []
+
+        async def converse(conversation_id, a, b):
+            for i in range(per_conversation):
+                start = time.perf_counter()
+                event = await _store_one(conversation_id, a if i % 2 else b, f"direct {i}")
+                acks.append(time.perf_counter() - start)
+                await channel_layer.group_send(f"chat_{conversation_id}", event)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(converse(*pair) for pair in pairs))
+        return time.perf_counter() - start, acks
+
+    async def _pipeline(self, pairs, per_conversation):
+        acks, pending = [], []
+
+        async def converse(conversation_id, a, b):
+            for i in range(per_conversation):
+                start = time.perf_counter()
+                pending.append(enqueue_message(conversation_id, (a if i % 2 else b).id, f"pipeline {i}"))
+                acks.append(time.perf_counter() - start)
+                # Yield like a socket waiting for its next frame
+                await asyncio.sleep(0)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(converse(*pair) for pair in pairs))
+        await asyncio.gather(*(p.persisted for p in pending))
+        return time.perf_counter() - start, acks
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from messaging.services import reconcile_read_states
+
+
+class Command(BaseCommand):
+    help = "Recount unread messages per participant and repair drifted ReadState counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('conversation_ids', nargs='*', help="Limit to these conversations")
+
+    def handle(self, *args, **options):
+        repaired = reconcile_read_states(options['conversation_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} read states"))
@@ -0,0 +1,73 @@
+from channels.db import database_sync_to_async
+from core.cache import ephemeral_cache as cache
+from django.db.models import Q
+
+MEMBERSHIP_TTL = 60 * 60  # seconds
+
+
+def _membership_key(conversation_id):
+    return f"chat:members:{conversation_id}"
+
+
+def _build_members(conversation_id):
+    """Profile ids allowed to read and post in a conversation.
+
+    A one-to-one conversation whose two participants have blocked each
+    other, in either direction, has no members at all.
+    """
+    from interactions.models import Block
+    from .models import Conversation
+
+    members = frozenset(
+        Conversation.participants.through.objects
+        .filter(conversation_id=conversation_id)
+        .values_list('profile_id', flat=True)
+    )
+    if len(members) == 2:
+        a, b = members
+        if Block.objects.filter(
+            Q(blocker_id=a, blocked_id=b) | Q(blocker_id=b, blocked_id=a)
+        ).exists():
+            return frozenset()
+    return members
+
+
+def get_members(conversation_id):
+    """Return the cached member set for a conversation, rebuilding it on a miss"""
+    members = cache.get(_membership_key(conversation_id))
+    if members is None:
+        members = _build_members(conversation_id)
+        cache.set(_membership_key(conversation_id), members, timeout=MEMBERSHIP_TTL)
+    return members
+
+
+def is_member(conversation_id, profile_id):
+    return profile_id in get_members(conversation_id)
+
+
+async def aget_members(conversation_id):
+    """Async get_members for consumers; only a miss touches the database"""
+    members = await cache.aget(_membership_key(conversation_id))
+    if members is None:
+        members = await database_sync_to_async(get_members)(conversation_id)
+    return members
+
+
+def invalidate_membership(*conversation_ids):
+    cache.delete_many([_membership_key(conversation_id) for conversation_id in conversation_ids])
+
+
+def invalidate_pair_membership(profile_a_id, profile_b_id):
+    """Drop cached membership for every conversation shared by two profiles"""
+    from .models import Conversation
+
+    # Joined on participants rather than pair_key so keyless duplicates
+    # left over from before pair keys are covered too; blocks are rare
+    conversation_ids = list(
+        Conversation.objects
+        .filter(participants=profile_a_id)
+        .filter(participants=profile_b_id)
+        .values_list('id', flat=True)
+    )
+    if conversation_ids:
+        invalidate_membership(*conversation_ids)
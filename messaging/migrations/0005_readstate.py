@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-18 09:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_read_states(apps, schema_editor):
+    Conversation = apps.get_model('messaging', 'Conversation')
+    Message = apps.get_model('messaging', 'Message')
+    ReadState = apps.get_model('messaging', 'ReadState')
+
+    states = []
+    for conversation in Conversation.objects.prefetch_related('participants'):
+        for profile in conversation.participants.all():
+            unread = Message.objects.filter(
+                conversation=conversation
+            ).exclude(
+                sender=profile
+            ).exclude(
+                reads__profile=profile
+            ).count()
+            states.append(ReadState(conversation=conversation, profile=profile, unread_count=unread))
+    ReadState.objects.bulk_create(states, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_profile_age'),
+        ('messaging', '0004_delete_thread'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='messaging.conversation')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='accounts.profile')),
+            ],
+            options={
+                'unique_together': {('conversation', 'profile')},
+            },
+        ),
+        migrations.RunPython(backfill_read_states, migrations.RunPython.noop),
+    ]
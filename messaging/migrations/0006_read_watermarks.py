@@ -0,0 +1,74 @@
+# Generated by Django 6.0 on 2026-10-18 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def collapse_message_reads(apps, schema_editor):
+    """
+    Turn per-message MessageRead rows into one read cursor per participant:
+    the newest message each profile has read in each conversation. Unread
+    counts are recomputed from the new cursors.
+    """
+    Message = apps.get_model('messaging', 'Message')
+    MessageRead = apps.get_model('messaging', 'MessageRead')
+    ReadState = apps.get_model('messaging', 'ReadState')
+
+    newest = {}
+    reads = MessageRead.objects.values_list(
+        'profile_id', 'message__conversation_id', 'message_id', 'message__created_at'
+    ).iterator(chunk_size=2000)
+    for profile_id, conversation_id, message_id, created_at in reads:
+        key = (conversation_id, profile_id)
+        if key not in newest or created_at > newest[key][1]:
+            newest[key] = (message_id, created_at)
+
+    for state in ReadState.objects.iterator(chunk_size=500):
+        cursor = newest.get((state.conversation_id, state.profile_id))
+        unread = Message.objects.filter(conversation_id=state.conversation_id).exclude(sender_id=state.profile_id)
+        if cursor:
+            state.last_read_message_id, state.last_read_at = cursor
+            unread = unread.filter(created_at__gt=state.last_read_at)
+        state.unread_count = unread.count()
+        state.save(update_fields=['last_read_message', 'last_read_at', 'unread_count'])
+
+
+def expand_read_cursors(apps, schema_editor):
+    Message = apps.get_model('messaging', 'Message')
+    MessageRead = apps.get_model('messaging', 'MessageRead')
+    ReadState = apps.get_model('messaging', 'ReadState')
+
+    for state in ReadState.objects.filter(last_read_at__isnull=False).iterator(chunk_size=500):
+        read = Message.objects.filter(
+            conversation_id=state.conversation_id,
+            created_at__lte=state.last_read_at
+        ).exclude(sender_id=state.profile_id)
+        MessageRead.objects.bulk_create(
+            [MessageRead(message_id=message_id, profile_id=state.profile_id) for message_id in read.values_list('id', flat=True)],
+            batch_size=500,
+            ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0005_readstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='readstate',
+            name='last_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='readstate',
+            name='last_read_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.message'),
+        ),
+        migrations.RunPython(collapse_message_reads, expand_read_cursors),
+        migrations.DeleteModel(
+            name='MessageRead',
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-18 13:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+PREVIEW_LENGTH = 140
+
+
+def backfill_last_message(apps, schema_editor):
+    Conversation = apps.get_model('messaging', 'Conversation')
+    Message = apps.get_model('messaging', 'Message')
+
+    for conversation in Conversation.objects.iterator(chunk_size=500):
+        latest = Message.objects.filter(conversation=conversation).order_by('-created_at', '-id').first()
+        if latest is None:
+            continue
+        body = latest.body
+        if len(body) > PREVIEW_LENGTH:
+            body = body[:PREVIEW_LENGTH - 1] + '…'
+        Conversation.objects.filter(pk=conversation.pk).update(
+            last_message=latest,
+            last_message_at=latest.created_at,
+            last_message_preview=body
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0007_message_history_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=140),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+def backfill_pair_keys(apps, schema_editor):
+    """
+    Key every two-person conversation. Where the old double-join lookup
+    let duplicates be created, the most recently active one gets the key
+    and the others stay reachable by id only.
+    """
+    Conversation = apps.get_model('messaging', 'Conversation')
+
+    winners = {}
+    for conversation in Conversation.objects.prefetch_related('participants').iterator(chunk_size=500):
+        profile_ids = [profile.id for profile in conversation.participants.all()]
+        if len(profile_ids) != 2:
+            continue
+        key = '-'.join(sorted(profile_id.hex for profile_id in profile_ids))
+        activity = conversation.last_message_at or conversation.created_at
+        if key not in winners or activity > winners[key][1]:
+            winners[key] = (conversation.pk, activity)
+
+    for key, (conversation_id, _) in winners.items():
+        Conversation.objects.filter(pk=conversation_id).update(pair_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0008_conversation_last_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='pair_key',
+            field=models.CharField(blank=True, editable=False, max_length=65, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_pair_keys, migrations.RunPython.noop),
+    ]
@@ -4,10 +4,24 @@ from django.utils import timezone
 
 
 
+PREVIEW_LENGTH = 140
+
+
+def make_pair_key(profile_a_id, profile_b_id):
+    """Order-independent key for the one-to-one conversation between two profiles"""
+    return '-'.join(sorted((profile_a_id.hex, profile_b_id.hex)))
+
+
 class Conversation(models.Model):
     id           = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     participants = models.ManyToManyField('accounts.Profile')
     created_at   = models.DateTimeField(auto_now_add=True)
+    pair_key     = models.CharField(max_length=65, unique=True, null=True, blank=True, editable=False)
+
+    # Denormalized from the newest message by messaging.services.create_message
+    last_message         = models.ForeignKey( 'Message',related_name='+',null=True,blank=True,on_delete=models.SET_NULL )
+    last_message_at      = models.DateTimeField(null=True, blank=True, db_index=True)
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH, blank=True)
 
     def __str__(self):
         return f"Conversation {self.id}"
@@ -18,22 +32,33 @@ class Message(models.Model):
     conversation = models.ForeignKey( Conversation,related_name='messages',on_delete=models.CASCADE )
     sender       = models.ForeignKey( 'accounts.Profile',on_delete=models.CASCADE )
     body         = models.TextField()
-    created_at   = models.DateTimeField(auto_now_add=True)
+    # Stamped when the message is built rather than on insert, so batched
+    # writes keep the order the server accepted them in
+    created_at   = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ['created_at']
-
-
-
-class MessageRead(models.Model):
-    message = models.ForeignKey( Message,related_name='reads',on_delete=models.CASCADE )
-    profile = models.ForeignKey( 'accounts.Profile',on_delete=models.CASCADE )
-    read_at = models.DateTimeField(default=timezone.now)
+        indexes = [
+            # History pages are keyset scans on (created_at, id) within one conversation
+            models.Index(fields=['conversation', 'created_at', 'id'], name='message_history_idx'),
+        ]
+
+
+class ReadState(models.Model):
+    """
+    Per-participant read cursor. Every message in the conversation up to
+    last_read_at counts as read by profile, so unread badges and read
+    receipts are a single row read.
+    """
+    conversation      = models.ForeignKey( Conversation,related_name='read_states',on_delete=models.CASCADE )
+    profile           = models.ForeignKey( 'accounts.Profile',related_name='read_states',on_delete=models.CASCADE )
+    last_read_message = models.ForeignKey( Message,related_name='+',null=True,blank=True,on_delete=models.SET_NULL )
+    last_read_at      = models.DateTimeField(null=True, blank=True)
+    unread_count      = models.PositiveIntegerField(default=0)
+    updated_at        = models.DateTimeField(auto_now=True)
 
     class Meta:
-        unique_together = ('message', 'profile')
-
-
-
-
+        unique_together = ('conversation', 'profile')
 
+    def has_read(self, message):
+        return self.last_read_at is not None and message.created_at <= self.last_read_at
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import uuid
+from datetime import timedelta
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 5000
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 0.02  # seconds to wait for more messages before writing a batch
+
+
+class PendingMessage:
+    """A validated chat message with its server-assigned id and timestamp, not yet stored"""
+    __slots__ = ('id', 'sender_id', 'body', 'created_at', 'persisted')
+
+    def __init__(self, sender_id, body, created_at):
+        self.id = uuid.uuid4()
+        self.sender_id = sender_id
+        self.body = body
+        self.created_at = created_at
+        self.persisted = asyncio.get_running_loop().create_future()
+
+
+class ConversationWriteQueue:
+    """
+    FIFO of pending messages for one conversation with a single writer
+    task, so messages are stored and broadcast in the order they were
+    accepted, a batch per database round-trip.
+    """
+
+    def __init__(self, key, conversation_id):
+        self.key = key
+        self.conversation_id = conversation_id
+        self.queue = asyncio.Queue()
+        self.last_stamp = None
+        self.writer = None
+
+    def stamp(self):
+        # Strictly increasing, so history order matches acceptance order
+        now = timezone.now()
+        if self.last_stamp is not None and now <= self.last_stamp:
+            now = self.last_stamp + timedelta(microseconds=1)
+        self.last_stamp = now
+        return now
+
+    def put(self, sender_id, body):
+        pending = PendingMessage(sender_id, body, self.stamp())
+        self.queue.put_nowait(pending)
+        if self.writer is None or self.writer.done():
+            self.writer = asyncio.create_task(self.drain())
+        return pending
+
+    async def drain(self):
+        try:
+            await self._drain()
+        finally:
+            # Nothing can be queued between the empty check and this pop,
+            # so an idle conversation never keeps its queue around
+            if self.queue.empty() and _queues.get(self.key) is self:
+                del _queues[self.key]
+
+    async def _drain(self):
+        while not self.queue.empty():
+            if self.queue.qsize() < BATCH_SIZE:
+                # Give a burst a moment to build up into one batch
+                await asyncio.sleep(FLUSH_INTERVAL)
+            batch = [self.queue.get_nowait() for _ in range(min(self.queue.qsize(), BATCH_SIZE))]
+            await self.flush(batch)
+
+    async def flush(self, batch):
+        try:
+            events = await write_batch(self.conversation_id, batch)
+        except Exception as exc:
+            logger.exception("Failed to store %d chat messages for %s", len(batch), self.conversation_id)
+            for pending in batch:
+                if not pending.persisted.done():
+                    pending.persisted.set_exception(exc)
+            return
+
+        channel_layer = get_channel_layer()
+        for pending, event in zip(batch, events):
+            await channel_layer.group_send(f"chat_{self.conversation_id}", event)
+            if not pending.persisted.done():
+                pending.persisted.set_result(pending.id)
+
+
+@database_sync_to_async
+def write_batch(conversation_id, batch):
+    """Store a batch in one transaction and build its broadcast events"""
+    from .models import Conversation, Message
+    from .services import chat_message_event, persist_messages
+
+    # Senders were authorised against the membership cache on the socket,
+    # so there is nothing to load here; persist_messages only needs the pk
+    conversation = Conversation(pk=conversation_id)
+    messages = [
+        Message(
+            id=pending.id,
+            conversation=conversation,
+            sender_id=pending.sender_id,
+            body=pending.body,
+            created_at=pending.created_at,
+        )
+        for pending in batch
+    ]
+    persist_messages(conversation, messages)
+    return [chat_message_event(message) for message in messages]
+
+
+# Queues live on the event loop that created them
+_queues = {}
+
+
+def get_write_queue(conversation_id):
+    loop = asyncio.get_running_loop()
+    key = (id(loop), conversation_id)
+    write_queue = _queues.get(key)
+    if write_queue is None:
+        write_queue = _queues[key] = ConversationWriteQueue(key, conversation_id)
+    return write_queue
+
+
+def enqueue_message(conversation_id, sender_id, body):
+    """
+    Validate and queue a chat message. Returns the PendingMessage, whose
+    id and created_at are final and can be acked straight away; await
+    its persisted future to know it reached the database. Raises
+    ValueError for an empty or oversized body.
+    """
+    body = (body or '').strip()
+    if not body:
+        raise ValueError("Message is empty")
+    if len(body) > MAX_MESSAGE_LENGTH:
+        raise ValueError(f"Message is longer than {MAX_MESSAGE_LENGTH} characters")
+    return get_write_queue(conversation_id).put(sender_id, body)
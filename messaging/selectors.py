@@ -1,10 +1,12 @@
-from .models import Conversation, Message, MessageRead
-from django.db.models import Count, Q, Max, Exists, OuterRef
+from .models import Conversation, ReadState, make_pair_key
+from django.db.models import Q, Sum, OuterRef, Subquery, IntegerField, UUIDField
+from django.db.models.functions import Coalesce
+from interactions.models import Match
 
 
 def get_conversations_for_profile(profile):
-    """Get all conversations for a profile"""
-    return Conversation.objects.filter(participants=profile).order_by('-created_at')
+    """Get all conversations for a profile, most recently active first"""
+    return Conversation.objects.filter(participants=profile).order_by('-last_message_at', '-created_at')
 
 
 def get_conversation(conversation_id):
@@ -12,39 +14,91 @@ def get_conversation(conversation_id):
     return Conversation.objects.get(id=conversation_id)
 
 
-def get_messages_with_read_state(conversation, for_profile):
-    """Get messages with read state for a specific profile"""
-    messages = conversation.messages.select_related('sender').all()
-    
+HISTORY_PAGE_SIZE = 50
+
+
+def get_message_page(messages, before=None, limit=HISTORY_PAGE_SIZE):
+    """
+    The limit newest messages strictly before the (created_at, id)
+    position before, returned oldest first, plus whether older ones exist.
+
+    messages is a Message queryset already narrowed to one conversation,
+    so the scan runs on the (conversation, created_at, id) index.
+    """
+    messages = messages.order_by('-created_at', '-id')
+    if before is not None:
+        created_at, message_id = before
+        messages = messages.filter(
+            Q(created_at__lt=created_at) |
+            Q(created_at=created_at, id__lt=message_id)
+        )
+    rows = list(messages[:limit + 1])
+    page = rows[:limit]
+    page.reverse()
+    return page, len(rows) > limit
+
+
+def get_read_states(conversation):
+    """ReadState rows for a conversation, keyed by profile id"""
+    return {state.profile_id: state for state in conversation.read_states.all()}
+
+
+def get_messages_with_read_state(conversation, for_profile, before=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Get one page of messages with read state for a specific profile: the
+    latest limit messages, or the limit before the (created_at, id)
+    position before. Returns (messages, has_older).
+
+    is_read_by_me compares each message with for_profile's read cursor;
+    is_read on the profile's own messages means every other participant
+    has read it.
+    """
+    states = get_read_states(conversation)
+    mine = states.get(for_profile.id)
+    others = [state for profile_id, state in states.items() if profile_id != for_profile.id]
+
+    messages, has_older = get_message_page(
+        conversation.messages.select_related('sender'),
+        before=before,
+        limit=limit
+    )
     for message in messages:
-        message.is_read_by_me = MessageRead.objects.filter(
-            message=message,
-            profile=for_profile
-        ).exists()
+        message.is_read_by_me = bool(mine and mine.has_read(message))
+        if message.sender_id == for_profile.id:
+            message.is_read = bool(others) and all(state.has_read(message) for state in others)
+        else:
+            message.is_read = message.is_read_by_me
     
-    return messages
+    return messages, has_older
 
 
 def get_unread_count_for_conversation(conversation, profile):
     """Get count of unread messages in a conversation for a specific profile"""
-    return Message.objects.filter(
-        conversation=conversation
-    ).exclude(
-        sender=profile
-    ).exclude(
-        reads__profile=profile
-    ).count()
+    return ReadState.objects.filter(
+        conversation=conversation,
+        profile=profile
+    ).values_list('unread_count', flat=True).first() or 0
 
 
 def get_total_unread_count(profile):
     """Get total unread message count across all conversations"""
-    return Message.objects.filter(
-        conversation__participants=profile
-    ).exclude(
-        sender=profile
-    ).exclude(
-        reads__profile=profile
-    ).count()
+    return ReadState.objects.filter(
+        profile=profile,
+        unread_count__gt=0
+    ).aggregate(total=Sum('unread_count'))['total'] or 0
+
+
+def _unread_count_subquery(profile):
+    return Coalesce(
+        Subquery(
+            ReadState.objects.filter(
+                conversation=OuterRef('pk'),
+                profile=profile
+            ).values('unread_count')[:1],
+            output_field=IntegerField()
+        ),
+        0
+    )
 
 
 def get_conversations_with_unread_counts(profile):
@@ -52,11 +106,71 @@ def get_conversations_with_unread_counts(profile):
     conversations = Conversation.objects.filter(
         participants=profile
     ).annotate(
-        last_message_time=Max('messages__created_at'),
-        unread_count=Count(
-            'messages',
-            filter=Q(messages__reads__profile__isnull=True) & ~Q(messages__sender=profile)
-        )
-    ).order_by('-last_message_time')
+        unread_count=_unread_count_subquery(profile)
+    ).order_by('-last_message_at', '-created_at')
     
     return conversations
+
+
+def annotate_conversation_summaries(conversations, profile):
+    """
+    Fold what a conversation list row needs into the conversation query
+    itself: the other participant's id and profile's unread count. The
+    latest message comes from the denormalized last_message fields, so no
+    message history is touched.
+    """
+    other = (
+        Conversation.participants.through.objects
+        .filter(conversation=OuterRef('pk'))
+        .exclude(profile=profile)
+        .values('profile')[:1]
+    )
+    return conversations.annotate(
+        other_id=Subquery(other, output_field=UUIDField()),
+        unread_count=_unread_count_subquery(profile),
+    )
+
+
+def get_inbox(profile):
+    """
+    Matches for profile, most recently active first, each carrying other,
+    conversation, last_message_body, last_message_at and unread_count.
+
+    Runs two queries however many matches there are: one for the matches
+    and their profiles, and one fetching the conversations by pair key
+    with the ReadState unread count folded in as a subquery and the
+    preview read from the denormalized last_message fields.
+    """
+    matches = list(
+        Match.objects
+        .filter(Q(profile1=profile) | Q(profile2=profile))
+        .select_related('profile1__user', 'profile2__user')
+        .order_by('-created_at')
+    )
+    if not matches:
+        return matches
+
+    for match in matches:
+        match.other = match.other_profile(profile)
+
+    conversations = Conversation.objects.filter(
+        pair_key__in=[make_pair_key(match.profile1_id, match.profile2_id) for match in matches]
+    ).annotate(unread_count=_unread_count_subquery(profile))
+    by_pair = {conversation.pair_key: conversation for conversation in conversations}
+
+    for match in matches:
+        match.conversation = by_pair.get(make_pair_key(match.profile1_id, match.profile2_id))
+        if match.conversation:
+            match.unread_count = match.conversation.unread_count
+            match.last_message_body = match.conversation.last_message_preview
+            match.last_message_at = match.conversation.last_message_at
+        else:
+            match.unread_count = 0
+            match.last_message_body = None
+            match.last_message_at = None
+
+    # Most recent activity first: a conversation's last message, or the
+    # match itself for pairs that have not talked yet, so a new match
+    # sits above conversations that went quiet before it
+    matches.sort(key=lambda match: match.last_message_at or match.created_at, reverse=True)
+    return matches
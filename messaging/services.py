@@ -1,7 +1,15 @@
+from collections import Counter
 from interactions.models import Match
-from .models import Conversation, Message
+from .models import Conversation, Message, make_pair_key
+from django.core.exceptions import PermissionDenied
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from .models import MessageRead
+from django.utils.text import Truncator
+from .membership import is_member
+from .models import PREVIEW_LENGTH, ReadState
+from .typing import clear_typing
 
 
 
@@ -11,66 +19,219 @@ def get_or_create_conversation(profile_a, profile_b):
        not Match.objects.filter(profile1=profile_b, profile2=profile_a).exists():
         raise PermissionDenied("Users are not matched")
 
-    conversation = (
-        Conversation.objects
-        .filter(participants=profile_a)
-        .filter(participants=profile_b)
-        .first()
-    )
+    conversation, _ = get_or_create_pair_conversation(profile_a, profile_b)
+    return conversation
+
 
+def get_or_create_pair_conversation(profile_a, profile_b):
+    """
+    The one-to-one conversation between two profiles, found by its pair
+    key. The unique key means concurrent callers end up with the same
+    conversation instead of creating duplicates. Returns
+    (conversation, created).
+    """
+    pair_key = make_pair_key(profile_a.id, profile_b.id)
+    conversation = Conversation.objects.filter(pair_key=pair_key).first()
     if conversation:
-        return conversation
+        return conversation, False
 
-    conversation = Conversation.objects.create()
-    conversation.participants.add(profile_a, profile_b)
-    return conversation
+    try:
+        with transaction.atomic():
+            conversation = Conversation.objects.create(pair_key=pair_key)
+            conversation.participants.add(profile_a, profile_b)
+    except IntegrityError:
+        # Lost the race to a concurrent create
+        return Conversation.objects.get(pair_key=pair_key), False
+    return conversation, True
 
 
 def send_message(sender, conversation, body):
-    if not conversation.participants.filter(id=sender.id).exists():
+    if not is_member(conversation.id, sender.id):
         raise PermissionDenied("Not a participant in this conversation")
 
-    message = Message.objects.create(
-        conversation=conversation,
-        sender=sender,
-        body=body
-    )
+    message = create_message(sender, conversation, body)
+    clear_typing(conversation.id, sender.id)
 
     # Broadcast via WebSockets
-    from django.template.loader import render_to_string
     from asgiref.sync import async_to_sync
     from channels.layers import get_channel_layer
 
-    channel_layer = get_channel_layer()
-    html = render_to_string('web/messaging/partials/message.html', {
-        'message': message,
-        'profile': None # Ensure recipient logic works
-    })
-
-    # Wrap in OOB swap for HTMX
-    oob_html = f'<div id="messages" hx-swap-oob="beforeend">{html}</div>'
-
-    async_to_sync(channel_layer.group_send)(
+    async_to_sync(get_channel_layer().group_send)(
         f"chat_{conversation.id}",
-        {
-            "type": "chat_message",
-            "id": str(message.id),
-            "sender_id": str(sender.id),
-            "message": message.body,
-            "timestamp": message.created_at.isoformat(),
-            "html": oob_html,
-        }
+        chat_message_event(message)
     )
 
     return message
 
 
+def chat_message_event(message):
+    """
+    The chat group event announcing a stored message. Plain data only:
+    consumers of HTML sockets render it themselves (see ChatConsumer).
+    """
+    return {
+        "type": "chat_message",
+        "id": str(message.id),
+        "sender_id": str(message.sender_id),
+        "message": message.body,
+        "timestamp": message.created_at.isoformat(),
+    }
+
+
+def create_message(sender, conversation, body):
+    """
+    Store a message, point the conversation's last_message fields at it
+    and bump every other participant's unread counter, all in one
+    transaction.
+    """
+    message = Message(conversation=conversation, sender=sender, body=body)
+    persist_messages(conversation, [message])
+    return message
+
+
+def persist_messages(conversation, messages):
+    """
+    Insert already-built messages for one conversation in a single
+    bulk_create, in the order given, then move the last_message pointer
+    and bump unread counters once for the whole batch.
+    """
+    if not messages:
+        return messages
+
+    last = messages[-1]
+    preview = Truncator(last.body).chars(PREVIEW_LENGTH)
+    sent = Counter(message.sender_id for message in messages)
+
+    with transaction.atomic():
+        Message.objects.bulk_create(messages)
+        # Never move the pointer back if a concurrent send committed a newer message
+        Conversation.objects.filter(
+            Q(last_message_at__isnull=True) | Q(last_message_at__lte=last.created_at),
+            pk=conversation.pk
+        ).update(
+            last_message=last,
+            last_message_at=last.created_at,
+            last_message_preview=preview
+        )
+        # Each participant gains every message in the batch they did not send
+        ReadState.objects.filter(conversation=conversation).update(
+            unread_count=F('unread_count') + Case(
+                *[When(profile_id=sender_id, then=Value(len(messages) - count)) for sender_id, count in sent.items()],
+                default=Value(len(messages))
+            )
+        )
+
+    conversation.last_message = last
+    conversation.last_message_at = last.created_at
+    conversation.last_message_preview = preview
+    return messages
+
+
+def unread_messages(conversation_id, profile, after=None):
+    """Messages from other participants newer than the read cursor after"""
+    messages = Message.objects.filter(conversation_id=conversation_id).exclude(sender=profile)
+    if after is not None:
+        messages = messages.filter(created_at__gt=after)
+    return messages
+
+
 def mark_conversation_as_read(profile, conversation):
-    messages = conversation.messages.exclude(sender=profile)
+    """Move profile's read cursor to the newest message in one UPDATE"""
+    latest = Message.objects.filter(conversation=conversation).order_by('-created_at', '-id')
+    ReadState.objects.filter(
+        conversation=conversation,
+        profile=profile
+    ).filter(
+        Q(unread_count__gt=0) | Q(last_read_at__isnull=True)
+    ).update(
+        last_read_message=Subquery(latest.values('pk')[:1]),
+        last_read_at=Subquery(latest.values('created_at')[:1]),
+        unread_count=0
+    )
 
-    for message in messages:
-        MessageRead.objects.get_or_create(
-            message=message,
-            profile=profile
+
+def mark_message_as_read(profile, message):
+    """
+    Advance profile's read cursor to message, which marks everything up to
+    and including it as read. Never moves the cursor backwards; returns
+    whether it moved.
+    """
+    remaining = (
+        unread_messages(message.conversation_id, profile, after=message.created_at)
+        .order_by()
+        .values('conversation')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    ReadState.objects.filter(
+        conversation_id=message.conversation_id,
+        profile=profile
+    ).filter(
+        Q(last_read_at__isnull=True) | Q(last_read_at__lt=message.created_at)
+    ).update(
+        last_read_message=message,
+        last_read_at=message.created_at,
+        unread_count=Coalesce(Subquery(remaining, output_field=IntegerField()), 0)
+    ) > 0
+
+
+def mark_read_up_to(profile, conversation, message=None, until=None):
+    """
+    Mark every message in conversation up to message, or up to the
+    timestamp until, as read in one UPDATE and push one read_receipt event
+    to the chat group. With neither, marks the whole conversation read.
+
+    Returns profile's ReadState for the conversation.
+    """
+    if message is None:
+        latest = conversation.messages.order_by('-created_at', '-id')
+        if until is not None:
+            latest = latest.filter(created_at__lte=until)
+        message = latest.first()
+
+    if message is not None and mark_message_as_read(profile, message):
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+
+        async_to_sync(get_channel_layer().group_send)(
+            f"chat_{conversation.id}",
+            {
+                "type": "read_receipt",
+                "reader_id": str(profile.id),
+                "last_read_message_id": str(message.id),
+                "last_read_at": message.created_at.isoformat(),
+            }
         )
 
+    return ReadState.objects.get(conversation=conversation, profile=profile)
+
+
+def reconcile_read_states(conversation_ids=None):
+    """
+    Recount unread messages from each read cursor and repair any ReadState
+    rows that have drifted, creating rows for participants that lack one.
+
+    Returns the number of rows created or corrected.
+    """
+    conversations = Conversation.objects.prefetch_related('participants', 'read_states')
+    if conversation_ids is not None:
+        conversations = conversations.filter(id__in=conversation_ids)
+
+    repaired = 0
+    for conversation in conversations.iterator(chunk_size=200):
+        states = {state.profile_id: state for state in conversation.read_states.all()}
+        for profile in conversation.participants.all():
+            state = states.get(profile.id)
+            after = state.last_read_at if state else None
+            unread = unread_messages(conversation.id, profile, after=after).count()
+            if state is None:
+                ReadState.objects.get_or_create(
+                    conversation=conversation,
+                    profile=profile,
+                    defaults={'unread_count': unread}
+                )
+                repaired += 1
+            elif state.unread_count != unread:
+                ReadState.objects.filter(pk=state.pk).update(unread_count=unread)
+                repaired += 1
+    return repaired
@@ -0,0 +1,41 @@
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+from .membership import invalidate_membership
+from .models import Conversation, ReadState
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def sync_read_states(sender, instance, action, reverse, pk_set, **kwargs):
+    """Give every participant a ReadState row and drop it when they leave"""
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    if reverse:
+        # profile.conversation_set.add(...): instance is the profile
+        pairs = [(conversation_id, instance.pk) for conversation_id in pk_set]
+    else:
+        pairs = [(instance.pk, profile_id) for profile_id in pk_set]
+
+    if action == 'post_add':
+        ReadState.objects.bulk_create(
+            [ReadState(conversation_id=c, profile_id=p) for c, p in pairs],
+            ignore_conflicts=True
+        )
+    else:
+        for conversation_id, profile_id in pairs:
+            ReadState.objects.filter(conversation_id=conversation_id, profile_id=profile_id).delete()
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def invalidate_conversation_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop cached chat membership whenever participants change"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        invalidate_membership(instance.pk)
+    elif pk_set:
+        invalidate_membership(*pk_set)
+    else:
+        # profile.conversation_set.clear(): the ids are gone by now
+        invalidate_membership(*instance.conversation_set.values_list('id', flat=True))
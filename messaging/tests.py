@@ -1,3 +1,284 @@
-from django.test import TestCase
+import asyncio
+from io import StringIO
+from channels.layers import get_channel_layer
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth import get_user_model
+from core.cache import ephemeral_cache
+from django.core.exceptions import PermissionDenied
+from django.core.management import call_command
+from django.urls import reverse
+from interactions.models import Match
+from interactions.services import block_user, unblock_user
+from messaging.consumers import render_chat_message
+from messaging.membership import get_members, is_member
+from messaging.models import Conversation, Message, ReadState
+from messaging.selectors import (
+    get_inbox, get_messages_with_read_state, get_total_unread_count, get_unread_count_for_conversation
+)
+from messaging.pipeline import MAX_MESSAGE_LENGTH, enqueue_message
+from messaging.typing import clear_typing, set_typing, typing_event, wait_for_typing
+from messaging.services import (
+    chat_message_event, create_message, get_or_create_pair_conversation, mark_conversation_as_read,
+    mark_message_as_read, send_message
+)
 
-# Create your tests here.
+User = get_user_model()
+
+
+class InboxTests(TestCase):
+    def setUp(self):
+        self.me = User.objects.create_user(email="me@example.com", password="password").profile
+        self.others = [
+            User.objects.create_user(email=f"match{i}@example.com", password="password").profile
+            for i in range(3)
+        ]
+        for other in self.others:
+            Match.objects.create(profile1=self.me, profile2=other)
+
+        self.conversation, _ = get_or_create_pair_conversation(self.me, self.others[0])
+        first = create_message(self.others[0], self.conversation, "hi")
+        create_message(self.others[0], self.conversation, "are you there?")
+        create_message(self.me, self.conversation, "yes")
+        mark_message_as_read(self.me, first)
+
+    def test_inbox_carries_preview_and_unread_count(self):
+        inbox = {match.other: match for match in get_inbox(self.me)}
+        self.assertEqual(set(inbox), set(self.others))
+
+        chatting = inbox[self.others[0]]
+        self.assertEqual(chatting.conversation, self.conversation)
+        self.assertEqual(chatting.unread_count, 1)
+        self.assertEqual(chatting.last_message_body, "yes")
+
+        idle = inbox[self.others[1]]
+        self.assertIsNone(idle.conversation)
+        self.assertEqual(idle.unread_count, 0)
+
+    def test_conversation_tracks_its_last_message(self):
+        latest = create_message(self.others[0], self.conversation, "x" * 500)
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message, latest)
+        self.assertEqual(self.conversation.last_message_at, latest.created_at)
+        self.assertEqual(len(self.conversation.last_message_preview), 140)
+        self.assertEqual(get_inbox(self.me)[0].conversation, self.conversation)
+
+    def test_new_match_sorts_above_an_older_conversation(self):
+        newcomer = User.objects.create_user(email="newcomer@example.com", password="password").profile
+        Match.objects.create(profile1=newcomer, profile2=self.me)
+        inbox = get_inbox(self.me)
+        self.assertEqual([match.other for match in inbox[:2]], [newcomer, self.others[0]])
+
+    def test_pair_conversation_is_shared_both_ways(self):
+        conversation, created = get_or_create_pair_conversation(self.others[0], self.me)
+        self.assertFalse(created)
+        self.assertEqual(conversation, self.conversation)
+        self.assertEqual(Conversation.objects.filter(participants=self.me).count(), 1)
+
+    def test_inbox_query_count_is_constant(self):
+        for other in self.others[1:]:
+            conversation, _ = get_or_create_pair_conversation(other, self.me)
+            create_message(other, conversation, "hey")
+
+        with self.assertNumQueries(2):
+            inbox = get_inbox(self.me)
+            for match in inbox:
+                match.other.user.email
+
+
+class ReadStateTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(email="alice@example.com", password="password").profile
+        self.bob = User.objects.create_user(email="bob@example.com", password="password").profile
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.alice, self.bob)
+
+    def test_counters_follow_sends_and_reads(self):
+        first = create_message(self.alice, self.conversation, "hi")
+        create_message(self.alice, self.conversation, "still there?")
+        self.assertEqual(get_unread_count_for_conversation(self.conversation, self.bob), 2)
+        self.assertEqual(get_total_unread_count(self.alice), 0)
+
+        mark_message_as_read(self.bob, first)
+        mark_message_as_read(self.bob, first)
+        self.assertEqual(get_total_unread_count(self.bob), 1)
+
+        mark_conversation_as_read(self.bob, self.conversation)
+        self.assertEqual(get_total_unread_count(self.bob), 0)
+
+    def test_reconcile_repairs_drift(self):
+        Message.objects.create(conversation=self.conversation, sender=self.alice, body="bypassed the service")
+        ReadState.objects.filter(profile=self.alice).delete()
+
+        call_command('reconcile_unread_counts', stdout=StringIO())
+        self.assertEqual(ReadState.objects.get(profile=self.bob).unread_count, 1)
+        self.assertEqual(ReadState.objects.get(profile=self.alice).unread_count, 0)
+
+    def test_read_receipts_follow_the_cursor(self):
+        first = create_message(self.alice, self.conversation, "hi")
+        second = create_message(self.alice, self.conversation, "hello?")
+        mark_message_as_read(self.bob, first)
+
+        messages, _ = get_messages_with_read_state(self.conversation, self.alice)
+        receipts = {m.id: m.is_read for m in messages}
+        self.assertEqual(receipts, {first.id: True, second.id: False})
+
+        with self.assertNumQueries(1):
+            mark_conversation_as_read(self.bob, self.conversation)
+        state = ReadState.objects.get(profile=self.bob)
+        self.assertEqual((state.last_read_message, state.unread_count), (second, 0))
+
+        # An older message never moves the cursor back
+        mark_message_as_read(self.bob, first)
+        self.assertEqual(ReadState.objects.get(profile=self.bob).last_read_message, second)
+
+
+class MembershipTests(TestCase):
+    def setUp(self):
+        ephemeral_cache.clear()
+        self.alice = User.objects.create_user(email="alice@example.com", password="password").profile
+        self.bob = User.objects.create_user(email="bob@example.com", password="password").profile
+        self.eve = User.objects.create_user(email="eve@example.com", password="password").profile
+        self.conversation, _ = get_or_create_pair_conversation(self.alice, self.bob)
+
+    def test_membership_is_cached(self):
+        self.assertEqual(get_members(self.conversation.id), {self.alice.id, self.bob.id})
+        with self.assertNumQueries(0):
+            self.assertTrue(is_member(self.conversation.id, self.bob.id))
+            self.assertFalse(is_member(self.conversation.id, self.eve.id))
+
+    def test_participant_changes_invalidate(self):
+        self.assertFalse(is_member(self.conversation.id, self.eve.id))
+        self.conversation.participants.add(self.eve)
+        self.assertTrue(is_member(self.conversation.id, self.eve.id))
+
+    def test_block_revokes_membership_both_ways(self):
+        self.assertTrue(is_member(self.conversation.id, self.alice.id))
+        block_user(self.bob, self.alice)
+
+        self.assertEqual(get_members(self.conversation.id), frozenset())
+        with self.assertRaises(PermissionDenied):
+            send_message(self.alice, self.conversation, "hello?")
+
+        unblock_user(self.bob, self.alice)
+        self.assertTrue(is_member(self.conversation.id, self.alice.id))
+
+
+class ChatPayloadTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(email="alice@example.com", password="password").profile
+        self.bob = User.objects.create_user(email="bob@example.com", password="password").profile
+        self.conversation, _ = get_or_create_pair_conversation(self.alice, self.bob)
+        self.event = chat_message_event(create_message(self.alice, self.conversation, "<b>hi</b>"))
+
+    def test_broadcast_carries_no_markup(self):
+        self.assertNotIn("html", self.event)
+        self.assertEqual(self.event["message"], "<b>hi</b>")
+
+    def test_html_sockets_render_for_the_recipient(self):
+        with self.assertNumQueries(0):
+            received = render_chat_message(self.event, self.bob.id)
+            sent = render_chat_message(self.event, self.alice.id)
+        self.assertIn('hx-swap-oob="beforeend"', received)
+        self.assertIn("&lt;b&gt;hi&lt;/b&gt;", received)
+        self.assertIn("justify-start", received)
+        self.assertIn("read-tick", sent)
+
+
+class TypingTests(TestCase):
+    def setUp(self):
+        ephemeral_cache.clear()
+        self.alice = User.objects.create_user(email="alice@example.com", password="password").profile
+        self.bob = User.objects.create_user(email="bob@example.com", password="password").profile
+        self.conversation, _ = get_or_create_pair_conversation(self.alice, self.bob)
+
+    def test_typing_broadcasts_are_debounced(self):
+        self.assertTrue(set_typing(self.conversation.id, self.bob.id))
+        self.assertFalse(set_typing(self.conversation.id, self.bob.id))
+        clear_typing(self.conversation.id, self.bob.id)
+        self.assertTrue(set_typing(self.conversation.id, self.bob.id))
+
+    def test_long_poll_wakes_on_typing_event(self):
+        async def scenario():
+            waiter = asyncio.create_task(wait_for_typing(self.conversation.id, {self.bob.id}, False, timeout=5))
+            await asyncio.sleep(0.05)
+            # Our own typing does not count
+            await get_channel_layer().group_send(f"chat_{self.conversation.id}", typing_event(self.alice.id))
+            await get_channel_layer().group_send(f"chat_{self.conversation.id}", typing_event(self.bob.id))
+            return await waiter
+
+        self.assertTrue(asyncio.run(scenario()))
+        self.assertFalse(asyncio.run(wait_for_typing(self.conversation.id, {self.bob.id}, False, timeout=0.05)))
+
+    def test_http_fallback_answers_when_state_differs(self):
+        self.alice.is_complete = True
+        self.alice.save()
+        self.client.force_login(self.alice.user)
+        self.assertTrue(is_member(self.conversation.id, self.alice.id))
+        set_typing(self.conversation.id, self.bob.id)
+
+        response = self.client.get(reverse('typing_status', args=[self.conversation.id]), {'typing': '0'})
+        self.assertContains(response, "typing…")
+        self.assertContains(response, "typing=1")
+
+
+class WritePipelineTests(TransactionTestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(email="alice@example.com", password="password").profile
+        self.bob = User.objects.create_user(email="bob@example.com", password="password").profile
+        self.conversation, _ = get_or_create_pair_conversation(self.alice, self.bob)
+
+    def test_batched_writes_keep_acceptance_order(self):
+        async def send_burst():
+            pending = [
+                enqueue_message(self.conversation.id, sender.id, f"message {i}")
+                for i, sender in enumerate([self.alice, self.bob, self.alice, self.alice, self.bob])
+            ]
+            await asyncio.gather(*(p.persisted for p in pending))
+            return pending
+
+        pending = asyncio.run(send_burst())
+
+        stored = list(self.conversation.messages.order_by('created_at', 'id'))
+        self.assertEqual([m.id for m in stored], [p.id for p in pending])
+        self.assertEqual([m.body for m in stored], [f"message {i}" for i in range(5)])
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message_id, pending[-1].id)
+        self.assertEqual(get_unread_count_for_conversation(self.conversation, self.alice), 2)
+        self.assertEqual(get_unread_count_for_conversation(self.conversation, self.bob), 3)
+
+    def test_failed_write_reaches_the_socket_after_the_ack(self):
+        import json
+        from unittest import mock
+        from messaging import pipeline
+        from messaging.consumers import ChatConsumer
+
+        async def send_through_consumer():
+            consumer = ChatConsumer()
+            consumer.room_id, consumer.profile_id = self.conversation.id, self.alice.id
+            frames = []
+
+            async def send(text_data):
+                frames.append(json.loads(text_data))
+            consumer.send = send
+
+            with mock.patch.object(pipeline, 'write_batch', side_effect=RuntimeError("database is locked")):
+                await consumer.accept_chat_message({"client_id": "c1", "message": "hello"})
+                for _ in range(100):
+                    if len(frames) == 2:
+                        break
+                    await asyncio.sleep(0.01)
+            return frames
+
+        with self.assertLogs('messaging.pipeline', level='ERROR'):
+            frames = asyncio.run(send_through_consumer())
+        self.assertEqual([(f["type"], f["client_id"]) for f in frames], [("ack", "c1"), ("error", "c1")])
+        self.assertFalse(Message.objects.exists())
+
+    def test_rejects_empty_and_oversized_messages(self):
+        async def send(body):
+            return enqueue_message(self.conversation.id, self.alice.id, body)
+
+        for body in ["   ", "x" * (MAX_MESSAGE_LENGTH + 1)]:
+            with self.assertRaises(ValueError):
+                asyncio.run(send(body))
@@ -2,7 +2,9 @@ import json
 import asyncio
 from django.test import TransactionTestCase
 from channels.testing import WebsocketCommunicator
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from core.asgi import application
+from core.middleware import get_user, token_cache
 from django.contrib.auth import get_user_model
 from accounts.models import Profile, User
 from messaging.models import Conversation
@@ -39,3 +41,53 @@ class WebSocketConnectionTest(TransactionTestCase):
         # but TransactionTestCase is usually sync.
         result = asyncio.run(run_test())
         self.assertEqual(result, "Success")
+
+
+class TokenCacheTest(TransactionTestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(email='ws_token@example.com', password='password123')
+        self.token = str(AccessToken.for_user(self.user))
+
+    def test_reconnects_skip_the_database(self):
+        user, profile_id = asyncio.run(get_user(self.token))
+        self.assertEqual((user, profile_id), (self.user, self.user.profile.id))
+
+        with self.assertNumQueries(0):
+            user, profile_id = asyncio.run(get_user(self.token))
+        self.assertEqual(user, self.user)
+        self.assertEqual(token_cache.stats()['hit_rate'], 0.5)
+
+    def test_blacklisting_forgets_the_user(self):
+        asyncio.run(get_user(self.token))
+        RefreshToken.for_user(self.user).blacklist()
+        self.assertIsNone(token_cache.get(self.token))
+
+    def test_invalid_tokens_are_not_cached(self):
+        user, profile_id = asyncio.run(get_user('not-a-token'))
+        self.assertFalse(user.is_authenticated)
+        self.assertEqual(token_cache.stats()['size'], 0)
+
+
+class WebSocketSessionAuthTest(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='ws_session@example.com', password='password123')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user.profile)
+        self.client.force_login(self.user)
+
+    def _connect(self, path):
+        async def run():
+            cookie = f"sessionid={self.client.cookies['sessionid'].value}".encode()
+            communicator = WebsocketCommunicator(application, path, headers=[(b"cookie", cookie)])
+            connected, _ = await communicator.connect()
+            if connected:
+                await communicator.disconnect()
+            return connected
+        return asyncio.run(run())
+
+    def test_browser_sockets_authenticate_by_session_cookie(self):
+        self.assertTrue(self._connect(f"/ws/chat/{self.conversation.id}/?format=html"))
+
+    def test_a_token_takes_precedence_over_the_session(self):
+        self.assertFalse(self._connect(f"/ws/chat/{self.conversation.id}/?token=not-a-token"))
@@ -1,22 +1,100 @@
-from django.core.cache import cache
+import asyncio
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from core.cache import ephemeral_cache as cache
 
 TYPING_TTL = 6  # seconds
+TYPING_DEBOUNCE = 2  # seconds between typing broadcasts per (conversation, profile)
+TYPING_RATE_LIMIT = 10  # typing frames accepted per socket per TYPING_RATE_WINDOW
+TYPING_RATE_WINDOW = 5  # seconds
+LONG_POLL_TIMEOUT = 25  # seconds
 
 
 def _typing_key(conversation_id, profile_id):
     return f"typing:{conversation_id}:{profile_id}"
 
 
+def _debounce_key(conversation_id, profile_id):
+    return f"typing:debounce:{conversation_id}:{profile_id}"
+
+
+def typing_event(profile_id):
+    return {"type": "typing_indicator", "user": str(profile_id)}
+
+
 def set_typing(conversation_id, profile_id):
+    """
+    Record that a profile is typing. Returns True when the other
+    participants should be told, at most once per TYPING_DEBOUNCE seconds.
+    """
     cache.set(
         _typing_key(conversation_id, profile_id),
         True,
         timeout=TYPING_TTL
     )
+    return cache.add(_debounce_key(conversation_id, profile_id), True, timeout=TYPING_DEBOUNCE)
 
 
-def is_typing(conversation_id, profile_id):
-    return cache.get(
+async def aset_typing(conversation_id, profile_id):
+    await cache.aset(
         _typing_key(conversation_id, profile_id),
-        False
+        True,
+        timeout=TYPING_TTL
     )
+    return await cache.aadd(_debounce_key(conversation_id, profile_id), True, timeout=TYPING_DEBOUNCE)
+
+
+def clear_typing(conversation_id, profile_id):
+    cache.delete_many([
+        _typing_key(conversation_id, profile_id),
+        _debounce_key(conversation_id, profile_id),
+    ])
+
+
+async def aclear_typing(conversation_id, profile_id):
+    await cache.adelete_many([
+        _typing_key(conversation_id, profile_id),
+        _debounce_key(conversation_id, profile_id),
+    ])
+
+
+def ping_typing(conversation_id, profile_id):
+    """set_typing for HTTP clients, pushing the debounced event to chat sockets"""
+    if set_typing(conversation_id, profile_id):
+        async_to_sync(get_channel_layer().group_send)(f"chat_{conversation_id}", typing_event(profile_id))
+
+
+async def wait_for_typing(conversation_id, others, typing, timeout=LONG_POLL_TIMEOUT):
+    """
+    Long-poll for the typing state of any of others, given the state the
+    client already shows. Returns as soon as it differs: on a typing
+    event, or on a message from the typist, which ends typing. Otherwise
+    returns the state once the timeout, or the typing TTL while someone
+    is typing, runs out.
+    """
+    others = {str(profile_id) for profile_id in others}
+    keys = [_typing_key(conversation_id, profile_id) for profile_id in others]
+
+    channel_layer = get_channel_layer()
+    channel = await channel_layer.new_channel()
+    group = f"chat_{conversation_id}"
+    await channel_layer.group_add(group, channel)
+    try:
+        # Checked after subscribing so a change in between is not missed
+        current = bool(await cache.aget_many(keys))
+        if current != typing:
+            return current
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (min(timeout, TYPING_TTL) if typing else timeout)
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event = await asyncio.wait_for(channel_layer.receive(channel), remaining)
+            except asyncio.TimeoutError:
+                break
+            if event["type"] == "typing_indicator" and event["user"] in others:
+                return True
+            if event["type"] == "chat_message" and event["sender_id"] in others:
+                return False
+        return bool(await cache.aget_many(keys))
+    finally:
+        await channel_layer.group_discard(group, channel)
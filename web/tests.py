@@ -1,3 +1,93 @@
-from django.test import TestCase
+from datetime import date
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from accounts.models import User
+from interactions.models import Match
+from messaging.services import create_message, get_or_create_pair_conversation
 
-# Create your tests here.
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class PageQueryCountTests(TestCase):
+    """
+    Guards the per-request query budget of the main pages. The profile is
+    loaded once per request and shared by the middlewares, the unread
+    count context processor and the views.
+    """
+
+    def setUp(self):
+        cache.clear()
+        caches['ephemeral'].clear()
+        self.user = User.objects.create_user(email="me@example.com", password="password")
+        self.profile = self._complete(self.user.profile)
+        other = self._complete(User.objects.create_user(email="other@example.com", password="password").profile)
+        Match.objects.create(profile1=self.profile, profile2=other)
+        self.conversation, _ = get_or_create_pair_conversation(self.profile, other)
+        create_message(other, self.conversation, "hi")
+        self.client.force_login(self.user)
+
+    def _complete(self, profile):
+        profile.is_complete = True
+        profile.is_visible = True
+        profile.save()
+        return profile
+
+    def assertPageQueries(self, num, url):
+        # Measure a warm request: membership, exclusions and last_seen are cached
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with self.assertNumQueries(num):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_discovery_feed(self):
+        self.assertPageQueries(7, reverse('discovery_feed'))
+
+    def test_inbox(self):
+        self.assertPageQueries(6, reverse('inbox'))
+
+    def test_conversation(self):
+        self.assertPageQueries(10, reverse('conversation_detail', args=[self.conversation.id]))
+
+    def test_activity(self):
+        self.assertPageQueries(10, reverse('activity'))
+
+    def test_settings(self):
+        self.assertPageQueries(4, reverse('settings'))
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class DiscoveryFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="viewer@example.com", password="password")
+        self.user.profile.is_complete = True
+        self.user.profile.save()
+        for i in range(15):
+            profile = User.objects.create_user(email=f"card{i}@example.com", password="password").profile
+            profile.is_complete = True
+            profile.birth_date = date(1990, 1, 1)
+            profile.save()
+        self.client.force_login(self.user)
+
+    def _cards(self):
+        response = self.client.get(reverse('discovery_feed'))
+        return {profile.id for profile in response.context['profiles']}
+
+    def test_each_load_continues_the_daily_order(self):
+        first, second, third = self._cards(), self._cards(), self._cards()
+        self.assertEqual(len(first), 10)
+        self.assertEqual(len(second), 5)
+        self.assertFalse(first & second)
+        # Everyone has been shown, so the next load starts over
+        self.assertEqual(third, first)
+
+    def test_skipping_hides_the_card(self):
+        from interactions.models import Skip
+
+        skipped = next(iter(self._cards()))
+        self.client.get(reverse('skip_profile', args=[skipped]))
+        self.assertTrue(Skip.objects.filter(from_profile=self.user.profile, to_profile_id=skipped).exists())
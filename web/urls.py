@@ -10,6 +10,7 @@ urlpatterns = [
     path('report/<uuid:profile_id>/', views.report_user_view, name='report_user'),
     path('inbox/', views.inbox, name='inbox'),
     path('conversation/<uuid:conversation_id>/', views.conversation_detail, name='conversation_detail'),
+    path('conversation/<uuid:conversation_id>/history/', views.conversation_history, name='conversation_history'),
     path('conversation/<uuid:conversation_id>/send/', views.send_message_view, name='send_message'),
     path('conversation/<uuid:conversation_id>/typing/',views.typing_ping,name='typing_ping' ),
     path('conversation/<uuid:conversation_id>/typing/status/',views.typing_status,name='typing_status'),
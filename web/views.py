@@ -3,27 +3,46 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
 from django.db import models
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.core.exceptions import PermissionDenied, ValidationError
 from accounts.selectors import get_profile_for_user
 from accounts.models import Profile
 from discovery.selectors import get_discovery_profiles, search_profiles
 from discovery.models import Preference
 from discovery.forms import PreferenceForm
 from accounts.constants import GEOGRAPHIC_DATA
-from interactions.services import handle_like
-from messaging.selectors import get_conversations_for_profile, get_conversation
+from interactions.services import handle_like, skip_user
+from messaging.selectors import get_conversations_for_profile, get_conversation, get_inbox
 from messaging.services import send_message
-from messaging.models import Conversation
+from messaging.models import Conversation, Message
 from messaging.services import mark_conversation_as_read
-from accounts.services import update_last_seen
-from messaging.typing import set_typing, is_typing
+from messaging.typing import ping_typing, wait_for_typing
+from messaging.membership import aget_members, is_member
 from accounts.presence import mark_online
-from interactions.models import Match
+
+
+DISCOVERY_PAGE_SIZE = 10
 
 
 @login_required
 def discovery_feed(request):
     profile = get_profile_for_user(request.user)
-    profiles = get_discovery_profiles(profile)
+
+    # Each load continues today's order where the previous one stopped,
+    # starting over once everyone has been shown
+    today = timezone.now().date().isoformat()
+    position = request.session.get('discovery_position')
+    after = (position[1], position[2]) if position and position[0] == today else None
+
+    profiles = get_discovery_profiles(profile, limit=DISCOVERY_PAGE_SIZE, after=after)
+    if len(profiles) == DISCOVERY_PAGE_SIZE:
+        last = profiles[-1]
+        request.session['discovery_position'] = [today, last.discovery_key, str(last.id)]
+    else:
+        request.session.pop('discovery_position', None)
     
     context = {'profiles': profiles}
     
@@ -59,7 +78,10 @@ def like_profile_view(request, profile_id):
 
 @login_required
 def skip_profile_view(request, profile_id):
-    """Skip a profile - just return an empty response to hide the card"""
+    """Skip a profile and return an empty response to hide the card"""
+    actor = get_profile_for_user(request.user)
+    target = get_object_or_404(Profile, id=profile_id)
+    skip_user(actor, target)
     return render(request, 'web/discovery/partials/skip_result.html')
 
 
@@ -69,13 +91,6 @@ def profile_view(request, profile_id):
     profile = get_object_or_404(Profile, id=profile_id)
     viewer = get_profile_for_user(request.user)
     
-    # Calculate age if birth_date exists
-    age = None
-    if profile.birth_date:
-        from datetime import date
-        today = date.today()
-        age = today.year - profile.birth_date.year - ((today.month, today.day) < (profile.birth_date.month, profile.birth_date.day))
-    
     from interactions.models import Like
     is_liked = Like.objects.filter(from_profile=viewer, to_profile=profile).exists()
     
@@ -85,7 +100,7 @@ def profile_view(request, profile_id):
 
     context = {
         'profile': profile,
-        'age': age,
+        'age': profile.age,
         'viewer': viewer,
         'is_liked': is_liked,
     }
@@ -140,31 +155,7 @@ def report_user_view(request, profile_id):
 def inbox(request):
     profile = get_profile_for_user(request.user)
 
-    matches = Match.objects.filter(
-        profile1=profile
-    ) | Match.objects.filter(
-        profile2=profile
-    )
-
-    matches = matches.order_by("-created_at")
-
-    # Annotate with 'other' user and conversation for template
-    for m in matches:
-        m.other = m.other_profile(profile)
-        # Find conversation between these two profiles
-        m.conversation = (
-            Conversation.objects
-            .filter(participants=profile)
-            .filter(participants=m.other)
-            .first()
-        )
-        
-        # Calculate unread count for this conversation
-        if m.conversation:
-            from messaging.selectors import get_unread_count_for_conversation
-            m.unread_count = get_unread_count_for_conversation(m.conversation, profile)
-        else:
-            m.unread_count = 0
+    matches = get_inbox(profile)
 
     return render(request, "web/messaging/inbox.html", {
         "matches": matches,
@@ -192,63 +183,86 @@ def conversation_detail(request, conversation_id):
 
     conversation = get_object_or_404(Conversation, id=conversation_id)
 
-    if not conversation.participants.filter(id=profile.id).exists():
-        from django.core.exceptions import PermissionDenied
+    if not is_member(conversation.id, profile.id):
         raise PermissionDenied
 
     # domain updates
     mark_conversation_as_read(profile, conversation)
-    update_last_seen(profile)
 
     # read-only selectors
     from messaging.selectors import get_messages_with_read_state
     # (Checking if get_presence_map is needed, but it was in the duplicate)
     # For now, let's just make it work.
-    chat_messages = get_messages_with_read_state(conversation, profile)
+    chat_messages, has_older = get_messages_with_read_state(conversation, profile)
     
     return render(request, 'web/messaging/conversation.html', {
         'conversation': conversation,
         'chat_messages': chat_messages,
+        'has_older': has_older,
         'profile': profile,
     })
 
 
-
 @login_required
-def typing_ping(request, conversation_id):
+def conversation_history(request, conversation_id):
+    """The page of messages before ?before=<message id>, for 'load older'"""
     profile = get_profile_for_user(request.user)
-    mark_online(profile.id)
-    conversation = get_object_or_404(Conversation, id=conversation_id)
-
-    if not conversation.participants.filter(id=profile.id).exists():
-        raise PermissionDenied
+    conversation = get_object_or_404(Conversation, id=conversation_id, participants=profile)
 
-    set_typing(conversation.id, profile.id)
+    try:
+        anchor = conversation.messages.only('id', 'created_at').get(id=request.GET.get('before'))
+    except (Message.DoesNotExist, ValidationError):
+        raise Http404
 
-    return render(
-        request,
-        'web/messaging/partials/typing_indicator.html',
-        {'typing': False}
+    from messaging.selectors import get_messages_with_read_state
+    chat_messages, has_older = get_messages_with_read_state(
+        conversation, profile, before=(anchor.created_at, anchor.id)
     )
 
+    return render(request, 'web/messaging/partials/history_page.html', {
+        'conversation': conversation,
+        'chat_messages': chat_messages,
+        'has_older': has_older,
+        'profile': profile,
+    })
+
+
 
 @login_required
-def typing_status(request, conversation_id):
+def typing_ping(request, conversation_id):
     profile = get_profile_for_user(request.user)
-    conversation = get_object_or_404(Conversation, id=conversation_id)
+    mark_online(profile.id)
+    if not is_member(conversation_id, profile.id):
+        raise PermissionDenied
 
-    other = conversation.participants.exclude(id=profile.id).first()
+    ping_typing(conversation_id, profile.id)
 
-    typing = is_typing(conversation.id, other.id) if other else False
+    return HttpResponse(status=204)
 
-    return render(
-        request,
-        'web/messaging/partials/typing_indicator.html',
-        {'typing': typing}
-    )
 
+@login_required
+async def typing_status(request, conversation_id):
+    """
+    Long-poll fallback for clients without the chat socket. ?typing=1|0 is
+    what the client shows now; the response comes back once that changes
+    or after LONG_POLL_TIMEOUT, and the partial immediately polls again.
+    """
+    profile = await sync_to_async(get_profile_for_user)(request.user)
+    members = await aget_members(conversation_id)
+    if profile.id not in members:
+        raise PermissionDenied
 
+    typing = await wait_for_typing(
+        conversation_id,
+        members - {profile.id},
+        request.GET.get('typing') == '1'
+    )
 
+    # No request context: context processors would query the database here
+    return HttpResponse(render_to_string(
+        'web/messaging/partials/typing_indicator.html',
+        {'typing': typing, 'conversation_id': conversation_id}
+    ))
 
 
 @login_required
@@ -324,7 +338,7 @@ def search_view(request):
     
     results = []
     if query:
-        results = search_profiles(query, for_profile=profile)
+        results = search_profiles(query, for_profile=profile, page=request.GET.get('page'))
     
     return render(request, 'web/discovery/search.html', {
         'query': query,